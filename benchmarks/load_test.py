@@ -0,0 +1,155 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Load test for the conversion server (src/server.py).
+
+Sends --requests POSTs from --concurrency client threads, each keeping
+one connection open, and reports throughput, status codes, cache hits
+and latency percentiles. Bodies are synthetic pages (benchmarks/
+synthetic.py); --distinct N rotates through N different pages, and
+--unique makes every body different so nothing is served from the
+server's cache.
+
+    python src/server.py -j 4 &
+    python benchmarks/load_test.py --endpoint /typst -c 8 -n 400
+    python benchmarks/load_test.py --spawn -j 2 --unique    # start a server for the run
+"""
+
+import argparse
+from collections import Counter
+import http.client
+import json
+import math
+from pathlib import Path
+import subprocess
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR))
+
+from synthetic import make_page
+
+SERVER_SCRIPT = BENCH_DIR.parent / "src" / "server.py"
+
+
+def percentile(sorted_values, fraction):
+    """Nearest-rank percentile of an ascending list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, math.ceil(fraction * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def wait_for_server(host, port, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            connection = http.client.HTTPConnection(host, port, timeout=1)
+            connection.request('GET', '/health')
+            if connection.getresponse().status == 200:
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def run_load(host, port, endpoint, bodies, requests, concurrency, unique=False):
+    """Send the requests and return (wall seconds, [(status, seconds, cache status)])"""
+    results = []
+    lock = threading.Lock()
+    next_request = iter(range(requests))
+
+    def client():
+        connection = http.client.HTTPConnection(host, port, timeout=120)
+        local = []
+        while True:
+            with lock:
+                n = next(next_request, None)
+            if n is None:
+                break
+            body = bodies[n % len(bodies)]
+            if unique:
+                body += f"<!-- load test request {n} -->".encode()
+            start = time.perf_counter()
+            try:
+                connection.request('POST', endpoint, body, {'Content-Type': 'text/html'})
+                response = connection.getresponse()
+                response.read()
+                status, cache = response.status, response.getheader('X-Cache', '')
+            except (OSError, http.client.HTTPException):
+                connection.close()
+                connection = http.client.HTTPConnection(host, port, timeout=120)
+                status, cache = 'error', ''
+            local.append((status, time.perf_counter() - start, cache))
+        connection.close()
+        with lock:
+            results.extend(local)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, results
+
+
+def report(wall, results):
+    statuses = Counter(status for status, _, _ in results)
+    hits = sum(1 for _, _, cache in results if cache == 'hit')
+    latencies = sorted(seconds for status, seconds, _ in results if status == 200)
+    print(f"\n{len(results)} requests in {wall:.2f}s: {len(results) / wall:.1f} req/s "
+          f"({len(latencies) / wall:.1f} successful/s)")
+    print("status: " + ', '.join(f"{status} x{count}" for status, count in sorted(statuses.items(), key=str)))
+    print(f"cache hits: {hits}")
+    if latencies:
+        print("latency of 200 responses (ms): " + ', '.join(
+            f"{name} {1000 * percentile(latencies, fraction):.1f}"
+            for name, fraction in (('p50', 0.5), ('p90', 0.9), ('p99', 0.99), ('max', 1.0))))
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Measure throughput and latency of src/server.py")
+    arg_parser.add_argument('--url', default='http://127.0.0.1:8765', help="server address (default: %(default)s)")
+    arg_parser.add_argument('--endpoint', default='/parse', choices=('/parse', '/typst', '/markdown', '/html'),
+                            help="endpoint to load (default: /parse)")
+    arg_parser.add_argument('-n', '--requests', type=int, default=200, help="total requests (default: 200)")
+    arg_parser.add_argument('-c', '--concurrency', type=int, default=8, help="client threads (default: 8)")
+    arg_parser.add_argument('--distinct', type=int, default=8, help="different pages to rotate through (default: 8)")
+    arg_parser.add_argument('--unique', action='store_true', help="make every request body unique (no cache hits)")
+    arg_parser.add_argument('--scale', type=int, default=1, help="synthetic page scale (default: 1)")
+    arg_parser.add_argument('--spawn', action='store_true', help="start a server on --url for the duration of the run")
+    arg_parser.add_argument('-j', '--workers', type=int, default=0, help="with --spawn: server worker processes")
+    args = arg_parser.parse_args()
+
+    url = urlparse(args.url)
+    host, port = url.hostname, url.port or 80
+    bodies = [make_page(args.scale, seed=seed).encode('utf-8') for seed in range(args.distinct)]
+    print(f"{args.requests} x POST {args.endpoint}, {args.concurrency} clients, "
+          f"{len(bodies)} distinct page(s) of ~{sum(map(len, bodies)) / len(bodies) / 1024:.0f} KB"
+          f"{', unique bodies' if args.unique else ''}")
+
+    server = None
+    if args.spawn:
+        server = subprocess.Popen([sys.executable, str(SERVER_SCRIPT), '--host', host, '--port', str(port),
+                                   '-j', str(args.workers)])
+    try:
+        if not wait_for_server(host, port):
+            print(f"No server answering at {args.url}")
+            return 1
+        wall, results = run_load(host, port, args.endpoint, bodies, args.requests, args.concurrency, args.unique)
+        report(wall, results)
+        connection = http.client.HTTPConnection(host, port, timeout=5)
+        connection.request('GET', '/stats')
+        print(f"server stats: {json.loads(connection.getresponse().read())}")
+    finally:
+        if server:
+            server.terminate()
+            server.wait()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
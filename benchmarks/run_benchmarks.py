@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""
+Benchmark suite for the parser and the Typst generator.
+
+Times LocalHTMLParser.parse_article, LocalHTMLParser.parse_directory,
+escape_typst and generate_typst on synthetic Zhihu pages at several
+scales, and compares each result with benchmarks/baseline.json. A
+benchmark slower than its baseline by more than --tolerance is flagged
+and the script exits with status 1.
+
+    python benchmarks/run_benchmarks.py                    # 1x/10x/100x
+    python benchmarks/run_benchmarks.py --scales 1,10      # quicker run
+    python benchmarks/run_benchmarks.py --update-baseline  # record new numbers
+
+Baselines are machine-specific: record one on the machine you compare on.
+"""
+
+import argparse
+from contextlib import redirect_stdout
+import io
+import json
+from pathlib import Path
+import platform
+import sys
+import tempfile
+import time
+
+BENCH_DIR = Path(__file__).parent
+sys.path.insert(0, str(BENCH_DIR.parent / "src"))
+sys.path.insert(0, str(BENCH_DIR))
+
+from blocks import ListBlock
+from generate_ebook import EnhancedTypstEbookGenerator
+from parse_local_html import BACKENDS, LocalHTMLParser
+from synthetic import make_page, write_corpus
+
+BASELINE_PATH = BENCH_DIR / "baseline.json"
+
+
+def best_time(func, repeat):
+    """Run func `repeat` times (output silenced) and return the fastest wall time"""
+    best = None
+    for _ in range(repeat):
+        with redirect_stdout(io.StringIO()):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def run_benchmarks(scales, backend='auto', repeat=3):
+    """Return {benchmark name: best seconds} for every benchmark at every scale"""
+    parser = LocalHTMLParser(backend)
+    with redirect_stdout(io.StringIO()):
+        base_article = parser.parse_article(make_page(1))
+    base_texts = []
+    for block in base_article['content']:
+        if isinstance(block, ListBlock):
+            base_texts.extend(block.items)
+        elif block.type != 'code':
+            base_texts.append(block.text)
+    generator = EnhancedTypstEbookGenerator([])
+
+    results = {}
+    for scale in scales:
+        # The largest scales run once; they dominate the suite's run time
+        runs = repeat if scale < 100 else 1
+        print(f"  scale {scale}x ...", flush=True)
+
+        page = make_page(scale)
+        results[f"parse_article[{scale}x]"] = best_time(lambda: parser.parse_article(page), runs)
+        del page
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            write_corpus(tmp_dir, scale)
+            results[f"parse_directory[{scale}x]"] = best_time(lambda: parser.parse_directory(tmp_dir), runs)
+
+        texts = base_texts * scale
+        results[f"escape_typst[{scale}x]"] = best_time(
+            lambda: [generator.escape_typst(text) for text in texts], runs)
+
+        articles = [{'source_file': f"synthetic_{n}.html", 'data': base_article} for n in range(scale)]
+        results[f"generate_typst[{scale}x]"] = best_time(
+            lambda: EnhancedTypstEbookGenerator(articles).generate_typst(), runs)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """Print results next to the baseline and return the names of regressions"""
+    regressions = []
+    print(f"\n{'benchmark':<28} {'seconds':>10} {'baseline':>10} {'ratio':>7}")
+    for name, seconds in results.items():
+        reference = baseline.get(name)
+        if reference:
+            ratio = seconds / reference
+            flag = ''
+            if ratio > 1 + tolerance:
+                flag = '  REGRESSION'
+                regressions.append(name)
+            print(f"{name:<28} {seconds:10.4f} {reference:10.4f} {ratio:6.2f}x{flag}")
+        else:
+            print(f"{name:<28} {seconds:10.4f} {'-':>10} {'-':>7}")
+    return regressions
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Benchmark parsing and Typst generation on synthetic pages")
+    arg_parser.add_argument('--scales', default='1,10,100',
+                            help="comma-separated corpus scales (default: 1,10,100)")
+    arg_parser.add_argument('--backend', default='auto', choices=('auto',) + BACKENDS,
+                            help="HTML parser backend (default: fastest installed)")
+    arg_parser.add_argument('--repeat', type=int, default=3, help="runs per benchmark, best is kept (default: 3)")
+    arg_parser.add_argument('--tolerance', type=float, default=0.25,
+                            help="allowed slowdown over the baseline before flagging (default: 0.25 = 25%%)")
+    arg_parser.add_argument('--baseline', default=str(BASELINE_PATH), help="baseline JSON file")
+    arg_parser.add_argument('--update-baseline', action='store_true',
+                            help="store these results as the new baseline instead of comparing")
+    args = arg_parser.parse_args()
+
+    scales = [int(scale) for scale in args.scales.split(',')]
+    backend = LocalHTMLParser(args.backend).backend
+    print(f"Running benchmarks (backend: {backend}, scales: {scales})")
+    results = run_benchmarks(scales, args.backend, args.repeat)
+
+    baseline_path = Path(args.baseline)
+    baseline = {}
+    if baseline_path.exists():
+        with open(baseline_path, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+
+    if args.update_baseline:
+        # Keep entries for scales that were not run this time
+        merged = dict(baseline.get('results', {}))
+        merged.update(results)
+        with open(baseline_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                'machine': f"{platform.system()} {platform.machine()} / Python {platform.python_version()}",
+                'backend': backend,
+                'results': {name: round(seconds, 6) for name, seconds in sorted(merged.items())},
+            }, f, indent=2)
+            f.write('\n')
+        compare(results, {}, args.tolerance)
+        print(f"\nBaseline written to {baseline_path}")
+        return 0
+
+    if baseline.get('backend') and baseline['backend'] != backend:
+        print(f"Warning: baseline was recorded with backend {baseline['backend']!r}")
+    regressions = compare(results, baseline.get('results', {}), args.tolerance)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {args.tolerance:.0%}: {', '.join(regressions)}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
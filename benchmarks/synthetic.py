@@ -0,0 +1,124 @@
+"""Synthetic Zhihu-style pages for benchmarking.
+
+make_page() produces a saved-column page with the same structure the
+parser relies on: a <title>, h1.Post-Title, a div.Post-RichTextContainer
+holding headings, paragraphs, nested lists, highlight code blocks and
+quotes, related-part links, and kilobytes of inline <style>/<script>
+noise around it. Output is deterministic for a given seed.
+"""
+
+from pathlib import Path
+import random
+
+# Common CJK characters plus ASCII and the characters Typst needs escaped
+CJK_CHARS = ('的一是在不了有和人这中大为上个国我以要他时来用们生到作地于出就分对成会可主发年动同工也能下过子说产种面而方后多定行学法所民得经'
+             '智能体设计模式记忆管理提示词链路由工具使用规划反思多协作安全护栏评估监控')
+ASCII_WORDS = ('agent', 'memory', 'tool', 'LLM', 'prompt', 'ADK', 'LangChain', 'RAG', 'API', 'session_state')
+SPECIAL_CHARS = '#$_*[]<>@\\'
+
+CODE_SNIPPET = '''<div class="highlight"><pre><code class="language-python"><span class="kn">from</span> <span class="nn">agents</span> <span class="kn">import</span> <span class="n">Agent</span>
+
+<span class="k">def</span> <span class="nf">run_{n}</span><span class="p">(</span><span class="n">query</span><span class="p">):</span>
+    <span class="n">agent</span> <span class="o">=</span> <span class="n">Agent</span><span class="p">(</span><span class="n">name</span><span class="o">=</span><span class="s2">"agent_{n}"</span><span class="p">)</span>
+    <span class="k">return</span> <span class="n">agent</span><span class="o">.</span><span class="n">invoke</span><span class="p">({{</span><span class="s2">"input"</span><span class="p">:</span> <span class="n">query</span><span class="p">}})</span>
+</code></pre></div>'''
+
+
+def _sentence(rng, min_chars=20, max_chars=60):
+    parts = []
+    for _ in range(rng.randint(min_chars, max_chars)):
+        roll = rng.random()
+        if roll < 0.08:
+            parts.append(' ' + rng.choice(ASCII_WORDS) + ' ')
+        elif roll < 0.1:
+            parts.append(rng.choice(SPECIAL_CHARS))
+        else:
+            parts.append(rng.choice(CJK_CHARS))
+    return ''.join(parts) + '。'
+
+
+def _paragraph(rng):
+    text = ''.join(_sentence(rng) for _ in range(rng.randint(1, 4)))
+    # Inline markup as in real posts: bold runs and inline code
+    if rng.random() < 0.3:
+        cut = rng.randint(0, len(text) - 1)
+        text = f"{text[:cut]}<b>{text[cut:cut + 8]}</b>{text[cut + 8:]}"
+    if rng.random() < 0.2:
+        text += f" <code>{rng.choice(ASCII_WORDS)}()</code>"
+    return f'<p data-pid="p{rng.randrange(10**8)}">{text}</p>'
+
+
+def _list(rng, depth=0):
+    tag = 'ol' if rng.random() < 0.3 else 'ul'
+    items = []
+    for _ in range(rng.randint(2, 5)):
+        item = f"<b>{_sentence(rng, 4, 8)}</b>{_sentence(rng, 10, 30)}"
+        if depth < 2 and rng.random() < 0.25:
+            item += _list(rng, depth + 1)
+        items.append(f"<li>{item}</li>")
+    return f"<{tag}>{''.join(items)}</{tag}>"
+
+
+def _section(rng, index):
+    parts = [f'<h2 id="h_{index}">第{index}章：{_sentence(rng, 6, 12)}</h2>']
+    for sub in range(rng.randint(2, 4)):
+        parts.append(f'<h3 id="h_{index}_{sub}">{_sentence(rng, 4, 10)}</h3>')
+        for _ in range(rng.randint(3, 8)):
+            roll = rng.random()
+            if roll < 0.65:
+                parts.append(_paragraph(rng))
+            elif roll < 0.85:
+                parts.append(_list(rng))
+            elif roll < 0.95:
+                parts.append(CODE_SNIPPET.format(n=rng.randrange(1000)))
+            else:
+                parts.append(f"<blockquote>{_sentence(rng)}</blockquote>")
+    return ''.join(parts)
+
+
+def _noise(rng, kilobytes):
+    """Inline CSS and JS state of roughly the given size"""
+    rules = []
+    size = 0
+    while size < kilobytes * 1024:
+        rule = f".css-{rng.randrange(16**6):06x}{{display:flex;margin:{rng.randint(0, 32)}px;color:#{rng.randrange(16**6):06x}}}"
+        rules.append(rule)
+        size += len(rule)
+    state = ','.join(f'"k{i}":"{rng.randrange(10**12)}"' for i in range(kilobytes * 16))
+    return (f"<style>{''.join(rules)}</style>"
+            f'<script id="js-initialData" type="text/json">{{{state}}}</script>'
+            f"<script>!function(){{var a=document.querySelectorAll('div > p');}}();</script>")
+
+
+def make_page(scale=1, seed=0, noise_kb=1024):
+    """Return a synthetic page; scale=1 is about the size of one real column post"""
+    rng = random.Random(seed)
+    title = f"【AI Agent开发书籍】《智能体设计模式：构建智能系统的实践指南》（合成第{seed}部分）"
+    sections = ''.join(_section(rng, i) for i in range(1, 20 * scale + 1))
+    links = ''.join(
+        f'<a href="//zhuanlan.zhihu.com/p/{1960000000000000000 + n}">智能体设计模式（第{n}部分）</a>'
+        for n in range(1, 5)
+    )
+    return (
+        '<!DOCTYPE html>\n<html lang="zh"><head><meta charset="UTF-8">'
+        f'<title>(99+ 封私信 / 2 条消息) {title} - 知乎</title>'
+        f'{_noise(rng, noise_kb)}</head><body><div id="root"><header class="AppHeader">'
+        '<nav><a href="/">首页</a><a href="/follow">关注</a></nav></header>'
+        f'<main class="App-main"><article class="Post-Main"><header class="Post-Header">'
+        f'<h1 class="Post-Title">{title}</h1></header>'
+        f'<div class="Post-RichTextContainer"><div class="RichText ztext Post-RichText">{sections}</div></div>'
+        f'</article><div class="Recommendations">{links}</div></main></div>'
+        f'{_noise(rng, noise_kb // 4)}</body></html>'
+    )
+
+
+def write_corpus(directory, files, scale=1, seed=0):
+    """Write `files` synthetic pages into directory and return their paths"""
+    directory = Path(directory)
+    directory.mkdir(parents=True, exist_ok=True)
+    paths = []
+    for n in range(files):
+        path = directory / f"synthetic_{n:04d}.html"
+        path.write_text(make_page(scale, seed + n), encoding='utf-8')
+        paths.append(path)
+    return paths
@@ -3,88 +3,301 @@
 """
 智能体设计模式电子书 - 一键构建脚本
 运行此脚本自动解析HTML文件并生成Typst电子书
+
+解析与生成在同一进程内完成，文章数据直接在内存中传递，
+也可以通过 build_ebook() 作为库调用。
 """
 
-import subprocess
+import argparse
+import cProfile
+import pstats
 import sys
+import time
 from pathlib import Path
 
+sys.path.insert(0, str(Path(__file__).parent / "src"))
+
+from dedup import BlockDeduplicator
+from formats import RENDERERS, save_formats
+from generate_ebook import EnhancedTypstEbookGenerator
+from images import ImagePipeline
+from metrics import metrics
+from parse_local_html import BACKENDS, HTML_PATTERNS, LocalHTMLParser, save_to_jsonl
+from search_index import INDEX_FILENAME, build_index
+from volumes import save_volumes
+from watch import BookWatcher
+
+BOOK_FILENAME = "智能体设计模式.typ"
+
+
+def build_ebook(html_dir, output_dir, workers=1, backend='auto', use_cache=True,
+                dedup=True, save_json=None, split=False, images=True, recursive=False,
+                include=HTML_PATTERNS, exclude=(), volume_bytes=None, volume_blocks=None,
+                search_index=False, formats=('typst',), cross_references=False):
+    """Parse html_dir and write the Typst e-book to output_dir in this process.
+
+    save_json may be None (skip the intermediate file), 'jsonl' or 'json'.
+    split writes a master file plus output_dir/chapters/*.typ, rewriting
+    only the chapter files whose content changed. images copies the
+    pictures the articles use into output_dir/images (see ImagePipeline).
+    recursive, include and exclude select the HTML files (see
+    find_html_files).
+    volume_bytes / volume_blocks split the book into volumes of at most
+    that much article text or that many blocks, written by `workers`
+    processes and listed in output_dir/volumes.json (see save_volumes).
+    search_index also writes output_dir/search_index.bin for
+    `python src/search_index.py query`.
+    formats lists the outputs to write (typst, markdown, html, epub; see
+    save_formats); they are rendered from the same parsed articles, by
+    `workers` processes at once.
+    cross_references adds "see also" links from each section to the most
+    similar sections of other chapters (see crossref.similar_sections).
+    Returns a dict with the output path (None when the Typst book was
+    written as volumes, which are listed in volume_paths instead), the
+    format paths, article count and per-stage wall times in seconds.
+    """
+    html_dir = Path(html_dir)
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    timings = {}
+
+    # Stage 1: parse
+    start = time.perf_counter()
+    parser = LocalHTMLParser(backend)
+    cache_path = output_dir / ".parse_cache" if use_cache else None
+    articles = list(parser.iter_directory(html_dir, workers=workers, cache_path=cache_path,
+                                          recursive=recursive, include=include, exclude=exclude))
+    timings['parse'] = time.perf_counter() - start
+
+    # Optional intermediate file for the standalone generate_ebook.py
+    if save_json:
+        start = time.perf_counter()
+        if save_json == 'jsonl':
+            save_to_jsonl(articles, output_dir / "articles_data.jsonl")
+        else:
+            parser.save_to_json(articles, output_dir / "articles_data.json")
+        timings['save_json'] = time.perf_counter() - start
+
+    # Stage 2: images, dedup + generate
+    start = time.perf_counter()
+    pipeline = None
+    if images:
+        pipeline = ImagePipeline(output_dir / "images")
+        articles = list(pipeline.process(articles, html_dir))
+    timings['images'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    deduplicator = None
+    if dedup:
+        deduplicator = BlockDeduplicator()
+        articles = list(deduplicator.process(articles))
+    timings['dedup'] = time.perf_counter() - start
+
+    references = None
+    xref_summary = None
+    if cross_references and articles:
+        # Only imported when asked for: crossref may pull in NumPy and SciPy
+        import crossref
+        start = time.perf_counter()
+        references = crossref.similar_sections(articles)
+        xref_summary = crossref.summary(references)
+        timings['xref'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    output_path = output_dir / BOOK_FILENAME
+    volumes = None
+    format_paths = {}
+    # Split and multi-volume Typst have their own writers; everything else is one file per format
+    other_formats = list(formats)
+    if articles and 'typst' in formats and (split or volume_bytes or volume_blocks):
+        other_formats.remove('typst')
+        if volume_bytes or volume_blocks:
+            volumes = save_volumes(articles, output_path, volume_bytes, volume_blocks, workers=workers, split=split,
+                                   cross_references=references)
+        else:
+            generator = EnhancedTypstEbookGenerator(articles)
+            if references:
+                generator.set_cross_references(references)
+            generator.save_typst_split(output_path)
+            format_paths['typst'] = output_path
+    if articles and other_formats:
+        format_paths.update(save_formats(articles, output_path, other_formats, workers=workers,
+                                         cross_references=references))
+    timings['generate'] = time.perf_counter() - start
+
+    if search_index and articles:
+        start = time.perf_counter()
+        build_index(articles, output_dir / INDEX_FILENAME)
+        timings['index'] = time.perf_counter() - start
+    if pipeline:
+        print(pipeline.summary())
+    if deduplicator:
+        print(deduplicator.summary())
+    if xref_summary:
+        print(xref_summary)
+    for stage, seconds in timings.items():
+        metrics.add_time(f'build.{stage}', seconds)
+
+    return {
+        # Volume mode never writes the single book file
+        'output_path': output_path if articles and not volumes else None,
+        'volume_paths': [output_dir / volume['file'] for volume in volumes] if volumes else None,
+        'format_paths': format_paths,
+        'article_count': len(articles),
+        'timings': timings,
+    }
+
+
+def parse_size(text):
+    """Parse a byte count such as 500000, 800K or 2M"""
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    text = text.strip().upper().removesuffix('B')
+    if text and text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(text)
+
+
 def main():
     base_dir = Path(__file__).parent
-    src_dir = base_dir / "src"
     output_dir = base_dir / "output"
     html_dir = base_dir / "html_sources"
-    
-    # Ensure output directory exists
-    output_dir.mkdir(exist_ok=True)
-    
+
+    arg_parser = argparse.ArgumentParser(description="解析 html_sources/ 并生成 Typst 电子书")
+    arg_parser.add_argument('-j', '--workers', type=int, default=1,
+                            help="number of parser processes (0 = one per CPU, default: 1)")
+    arg_parser.add_argument('--backend', default='auto', choices=('auto',) + BACKENDS,
+                            help="HTML parser backend (default: fastest installed)")
+    arg_parser.add_argument('-r', '--recursive', action='store_true',
+                            help="also parse HTML files in subdirectories (skipping *_files asset folders)")
+    arg_parser.add_argument('--include', action='append', metavar='PATTERN',
+                            help="file pattern to parse, relative to html_sources/ (repeatable; default: *.html, *.htm)")
+    arg_parser.add_argument('--exclude', action='append', default=[], metavar='PATTERN',
+                            help="file or directory pattern to skip (repeatable)")
+    arg_parser.add_argument('--no-cache', action='store_true', help="re-parse every HTML file")
+    arg_parser.add_argument('--no-dedup', action='store_true',
+                            help="keep blocks that repeat content from earlier articles")
+    arg_parser.add_argument('--no-images', action='store_true',
+                            help="leave images out of the book")
+    arg_parser.add_argument('--save-json', choices=('jsonl', 'json'),
+                            help="also write the parsed articles to output/articles_data.jsonl or .json")
+    arg_parser.add_argument('--split', action='store_true',
+                            help="write one .typ file per chapter, rewriting only the chapters that changed")
+    arg_parser.add_argument('--volume-size', type=parse_size, metavar='BYTES',
+                            help="split the book into volumes of at most this much article text (e.g. 2M)")
+    arg_parser.add_argument('--volume-blocks', type=int, metavar='N',
+                            help="split the book into volumes of at most N content blocks")
+    arg_parser.add_argument('--format', action='append', choices=tuple(RENDERERS), metavar='FORMAT',
+                            help=f"output format (repeatable; {', '.join(RENDERERS)}; default: typst)")
+    arg_parser.add_argument('--index', action='store_true',
+                            help="also build output/search_index.bin for src/search_index.py query")
+    arg_parser.add_argument('--xref', action='store_true',
+                            help="add \"see also\" links between similar sections (faster with numpy + scipy)")
+    arg_parser.add_argument('--watch', action='store_true',
+                            help="stay running and rebuild whenever a file in html_sources/ changes")
+    arg_parser.add_argument('--debounce', type=float, default=0.2, metavar='SECONDS',
+                            help="with --watch, wait until saves have paused this long (default: 0.2)")
+    arg_parser.add_argument('--profile', nargs='?', const=str(output_dir / "build_profile.json"), metavar='PATH',
+                            help="write timers and counters as JSON (default: output/build_profile.json)")
+    arg_parser.add_argument('--cprofile', metavar='PATH',
+                            help="also dump cProfile statistics (pstats format) to PATH")
+    args = arg_parser.parse_args()
+    if args.watch and (args.volume_size or args.volume_blocks):
+        arg_parser.error("--watch cannot be combined with --volume-size/--volume-blocks")
+    if args.watch and args.xref:
+        arg_parser.error("--watch cannot be combined with --xref")
+    # Watch mode only rewrites the Typst book
+    if args.watch and (args.save_json or set(args.format or ['typst']) != {'typst'}):
+        arg_parser.error("--watch only writes Typst; it cannot be combined with --save-json or other --format values")
+
+    if args.profile:
+        metrics.enable()
+    profiler = cProfile.Profile() if args.cprofile else None
+
     print("=" * 60)
     print("智能体设计模式 - 电子书构建工具")
     print("=" * 60)
-    
-    # Step 1: Parse HTML files
-    print("\n[1/2] 解析 HTML 文件...")
-    parse_script = src_dir / "parse_local_html.py"
-    
-    # Temporarily change the script to use correct paths
-    result = subprocess.run(
-        [sys.executable, str(parse_script)],
-        cwd=str(html_dir),
-        capture_output=True,
-        text=True,
-        encoding='mbcs',
-        errors='replace'
-    )
-    
-    if result.returncode != 0:
-        print(f"解析失败: {result.stderr}")
-        # Try running from base directory
-        result = subprocess.run(
-            [sys.executable, str(parse_script)],
-            cwd=str(base_dir),
-            capture_output=True,
-            text=True,
-            encoding='mbcs',
-            errors='replace'
+
+    if args.watch:
+        watcher = BookWatcher(
+            html_dir,
+            output_dir,
+            BOOK_FILENAME,
+            workers=args.workers,
+            backend=args.backend,
+            use_cache=not args.no_cache,
+            dedup=not args.no_dedup,
+            split=args.split,
+            images=not args.no_images,
+            recursive=args.recursive,
+            include=args.include or HTML_PATTERNS,
+            exclude=args.exclude,
+            search_index=args.index,
+            debounce=args.debounce,
         )
-    
-    print(result.stdout)
-    
-    # Move articles_data.json to output if it was created in html_sources
-    json_in_html = html_dir / "articles_data.json"
-    json_in_output = output_dir / "articles_data.json"
-    if json_in_html.exists():
-        import shutil
-        shutil.move(str(json_in_html), str(json_in_output))
-    
-    # Step 2: Generate e-book
-    print("\n[2/2] 生成 Typst 电子书...")
-    generate_script = src_dir / "generate_ebook.py"
-    
-    result = subprocess.run(
-        [sys.executable, str(generate_script)],
-        cwd=str(base_dir),
-        capture_output=True,
-        text=True,
-        encoding='mbcs',
-        errors='replace'
+        watcher.run()
+        if args.profile:
+            metrics.save(args.profile)
+            print(f"性能报告已写入: {args.profile}")
+        return 0
+
+    total_start = time.perf_counter()
+    if profiler:
+        profiler.enable()
+    result = build_ebook(
+        html_dir,
+        output_dir,
+        workers=args.workers,
+        backend=args.backend,
+        use_cache=not args.no_cache,
+        dedup=not args.no_dedup,
+        save_json=args.save_json,
+        split=args.split,
+        images=not args.no_images,
+        recursive=args.recursive,
+        include=args.include or HTML_PATTERNS,
+        exclude=args.exclude,
+        volume_bytes=args.volume_size,
+        volume_blocks=args.volume_blocks,
+        search_index=args.index,
+        formats=tuple(dict.fromkeys(args.format or ['typst'])),
+        cross_references=args.xref,
     )
-    print(result.stdout)
-    if result.stderr:
-        print(result.stderr)
-    
-    # Move generated typ file to output
-    typ_file = base_dir / "智能体设计模式.typ"
-    if typ_file.exists():
-        import shutil
-        shutil.move(str(typ_file), str(output_dir / "智能体设计模式.typ"))
-    
+    if profiler:
+        profiler.disable()
+    total = time.perf_counter() - total_start
+
+    if not result['article_count']:
+        print("\n未找到可解析的 HTML 文件，请先将知乎文章保存到:")
+        print(f"  {html_dir}")
+        return 1
+
+    print("\n各阶段耗时:")
+    for stage, seconds in result['timings'].items():
+        print(f"  {stage:<10} {seconds:8.3f}s")
+    print(f"  {'total':<10} {total:8.3f}s")
+
+    if args.profile:
+        metrics.add_time('build.total', total)
+        metrics.save(args.profile)
+        print("\n性能指标:")
+        print(metrics.format_report())
+        print(f"\n性能报告已写入: {args.profile}")
+    if profiler:
+        profiler.dump_stats(args.cprofile)
+        print(f"\ncProfile 数据已写入: {args.cprofile}（累计耗时前 15 项如下）")
+        pstats.Stats(profiler).sort_stats('cumulative').print_stats(15)
+
     print("\n" + "=" * 60)
     print("✓ 构建完成！")
     print("=" * 60)
     print(f"\n输出文件位于: {output_dir}")
-    print("\n要编译为 PDF，请运行:")
-    print(f'  typst compile "{output_dir / "智能体设计模式.typ"}"')
+    typst_paths = result['volume_paths'] or ([result['format_paths']['typst']]
+                                             if 'typst' in result['format_paths'] else [])
+    if typst_paths:
+        print("\n要编译为 PDF，请运行:")
+        for path in typst_paths:
+            print(f'  typst compile "{path}"')
+    return 0
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -0,0 +1,106 @@
+"""Typed content blocks shared by the HTML parser and the e-book generator.
+
+Blocks are small __slots__ classes instead of dicts so tens of thousands of
+them stay compact in memory. They serialize to and from the dict schema used
+in articles_data.json / articles_data.jsonl:
+
+    {'type': 'heading', 'level': 2, 'text': ...}
+    {'type': 'paragraph', 'text': ...}
+    {'type': 'list', 'ordered': False, 'items': [...]}
+    {'type': 'code', 'text': ...}
+    {'type': 'quote', 'text': ...}
+    {'type': 'image', 'src': ..., 'caption': ..., 'path': ...}
+"""
+
+
+class Block:
+    """Base class for content blocks; subclasses list their fields in __slots__ in JSON key order"""
+    __slots__ = ()
+    type = None
+
+    def __init__(self, *args, **kwargs):
+        for name, value in zip(self.__slots__, args):
+            setattr(self, name, value)
+        for name, value in kwargs.items():
+            setattr(self, name, value)
+
+    def to_dict(self):
+        data = {'type': self.type}
+        for name in self.__slots__:
+            data[name] = getattr(self, name)
+        return data
+
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        fields = ', '.join(f"{name}={getattr(self, name)!r}" for name in self.__slots__)
+        return f"{type(self).__name__}({fields})"
+
+
+class HeadingBlock(Block):
+    __slots__ = ('level', 'text')
+    type = 'heading'
+
+
+class ParagraphBlock(Block):
+    __slots__ = ('text',)
+    type = 'paragraph'
+
+
+class ListBlock(Block):
+    __slots__ = ('ordered', 'items')
+    type = 'list'
+
+    def __init__(self, ordered=False, items=()):
+        self.ordered = ordered
+        self.items = list(items)
+
+
+class CodeBlock(Block):
+    __slots__ = ('text',)
+    type = 'code'
+
+
+class QuoteBlock(Block):
+    __slots__ = ('text',)
+    type = 'quote'
+
+
+class ImageBlock(Block):
+    """An image; src is as written in the HTML, path is filled in by the image pipeline"""
+    __slots__ = ('src', 'caption', 'path')
+    type = 'image'
+
+    def __init__(self, src, caption='', path=''):
+        self.src = src
+        self.caption = caption
+        self.path = path
+
+
+BLOCK_TYPES = {cls.type: cls for cls in (HeadingBlock, ParagraphBlock, ListBlock, CodeBlock, QuoteBlock, ImageBlock)}
+
+
+def block_from_dict(data):
+    """Build a typed block from its dict form; returns None for an unknown type"""
+    cls = BLOCK_TYPES.get(data.get('type'))
+    if cls is None:
+        return None
+    return cls(**{key: value for key, value in data.items() if key in cls.__slots__})
+
+
+def blocks_from_dicts(items):
+    """Convert dict blocks to typed blocks, dropping unknown types and passing typed blocks through"""
+    for item in items:
+        block = item if isinstance(item, Block) else block_from_dict(item)
+        if block is not None:
+            yield block
+
+
+def to_json(obj):
+    """json.dump(default=...) hook that serializes typed blocks to their dict form"""
+    if isinstance(obj, Block):
+        return obj.to_dict()
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
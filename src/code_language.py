@@ -0,0 +1,92 @@
+"""Heuristic language detection for code blocks.
+
+The parser keeps only the text of each code block, and most snippets in
+the book are Python, with some JSON and shell commands mixed in. Tagging
+them all as python mis-highlights the rest, so guess_language() scores a
+snippet against small keyword tables instead:
+
+- JSON is recognised structurally (an object or array whose lines are
+  mostly "key": value pairs);
+- otherwise the identifiers and operators in the first few kilobytes
+  (comments removed) are counted and weighted per language, plain
+  "name = value" lines count towards Python, and the best score wins if
+  it has enough evidence.
+
+Results are memoized by the code string, so a snippet repeated across
+articles (the full-text post and the part posts) is classified once.
+"""
+
+from collections import Counter
+from functools import lru_cache
+import re
+
+# Only the start of a long snippet is scanned; imports and definitions come first
+SCAN_LIMIT = 4000
+# A language needs at least this score to be picked; below it the block is left untagged
+MIN_SCORE = 2
+# A token counts at most this many times, so one repeated word cannot decide alone
+MAX_TOKEN_COUNT = 5
+
+# String literals are matched as whole tokens so the words inside them are not counted
+TOKEN_RE = re.compile(r'"""|"[^"\n]*"|\'[^\'\n]*\'|[A-Za-z_][A-Za-z0-9_]*|===|=>|:=|&&|\|\||[;:{}$]')
+# Shell and Python comments often mention commands ("# pip install ...")
+COMMENT_RE = re.compile(r'(?:^|(?<=\s))#.*$', re.M)
+# "name = value" at the start of a line, without let/const/var or a trailing semicolon
+ASSIGNMENT_RE = re.compile(r'^[A-Za-z_][\w.]*\s*=\s*[^=\s][^;\n]*$', re.M)
+JSON_PAIR_RE = re.compile(r'^\s*"[^"\n]*"\s*:')
+# Lines a JSON example in prose may add: elisions and // comments
+JSON_NEUTRAL_RE = re.compile(r'^\s*(?:[{}\[\],]*|\.\.\..*|//.*)$')
+
+TOKEN_WEIGHTS = {
+    'python': {
+        'def': 3, 'import': 2, 'from': 1, 'self': 3, 'elif': 4, 'None': 2, 'True': 1, 'False': 1,
+        'lambda': 2, 'print': 1, 'class': 1, 'return': 1, 'async': 1, 'await': 1, 'with': 1,
+        'as': 1, 'in': 1, 'not': 1, 'is': 1, 'and': 1, 'or': 1, 'pass': 2, '__init__': 4, '"""': 3,
+    },
+    'javascript': {
+        'const': 3, 'let': 2, 'var': 2, 'function': 3, 'console': 3, 'require': 2, 'undefined': 3,
+        'null': 1, 'this': 2, 'new': 1, 'export': 1, 'return': 1, '===': 3, '=>': 2, ';': 1, '&&': 1, '||': 1,
+    },
+    'bash': {
+        'pip': 3, 'cd': 2, 'echo': 3, 'export': 2, 'sudo': 3, 'apt': 2, 'npm': 2, 'npx': 2, 'git': 2,
+        'curl': 2, 'mkdir': 3, 'docker': 2, 'uvx': 2, 'fi': 3, 'then': 2, 'esac': 3, '$': 1,
+    },
+    'sql': {
+        'SELECT': 3, 'FROM': 2, 'WHERE': 3, 'INSERT': 3, 'UPDATE': 2, 'CREATE': 2, 'TABLE': 2, 'JOIN': 3,
+    },
+}
+# Tables inverted to token -> ((language, weight), ...) so each token is looked up once
+_TOKEN_LANGUAGES = {}
+for _language, _weights in TOKEN_WEIGHTS.items():
+    for _token, _weight in _weights.items():
+        _TOKEN_LANGUAGES.setdefault(_token, []).append((_language, _weight))
+
+
+def looks_like_json(code):
+    """True for an object or array whose non-bracket lines are mostly "key": value pairs"""
+    # '' in '{[' is True, so empty input would otherwise pass as a bracket-only document
+    if not code.strip():
+        return False
+    if not (code[:1] in '{[' and code[-1:] in '}]'):
+        return False
+    lines = [line for line in code.splitlines() if not JSON_NEUTRAL_RE.match(line)]
+    if not lines:
+        return True
+    pairs = sum(1 for line in lines if JSON_PAIR_RE.match(line))
+    return pairs >= 0.5 * len(lines)
+
+
+@lru_cache(maxsize=4096)
+def guess_language(code):
+    """Return a Typst raw language tag for a code snippet, or '' if there is too little evidence"""
+    code = code.strip()
+    if looks_like_json(code):
+        return 'json'
+    text = COMMENT_RE.sub('', code[:SCAN_LIMIT])
+    scores = Counter()
+    for token, count in Counter(TOKEN_RE.findall(text)).items():
+        for language, weight in _TOKEN_LANGUAGES.get(token, ()):
+            scores[language] += weight * min(count, MAX_TOKEN_COUNT)
+    scores['python'] += 2 * min(len(ASSIGNMENT_RE.findall(text)), MAX_TOKEN_COUNT)
+    language, score = scores.most_common(1)[0]
+    return language if score >= MIN_SCORE else ''
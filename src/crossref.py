@@ -0,0 +1,189 @@
+"""Automatic "see also" cross-references between sections.
+
+Every heading starts a section that runs to the next heading. Sections
+with enough prose are turned into TF-IDF vectors over the same terms the
+search index uses (CJK character bigrams and words, code blocks left
+out), and each section is linked to the few most similar sections in
+other chapters (an article's top-level headings):
+
+- weights are sublinear tf (1 + log tf) times smoothed idf, rows are
+  L2-normalized, so a dot product is the cosine similarity;
+- terms found in more than max_df of the sections say nothing about any
+  pair and are dropped before weighting;
+- with NumPy and SciPy installed the matrix is a scipy.sparse CSR matrix
+  and similarities are computed a block of rows at a time (rows x all
+  sections), with top-k picked by argpartition; without them, a pure
+  Python fallback accumulates dot products through an inverted index,
+  one row at a time. Both give the same links.
+
+Pairs scoring at least max_similarity are left out: they are copies of
+the same text rather than related material. The generator turns the
+pairs into Typst labels (generate_ebook.xref_label) and @references.
+"""
+
+from collections import Counter
+import heapq
+import math
+
+from blocks import CodeBlock, HeadingBlock, blocks_from_dicts
+from search_index import indexed_text, tokenize
+
+# Sections with less text than this are neither linked from nor linked to
+MIN_SECTION_CHARS = 200
+# Sections under a heading used this many times or more are left out
+GENERIC_TITLE_COUNT = 3
+
+
+def load_sparse():
+    """Return (numpy, scipy.sparse), or (None, None) when they are not installed.
+
+    Imported on first use rather than at module level: SciPy takes longer
+    to import than the rest of the build tool together.
+    """
+    try:
+        import numpy
+        from scipy import sparse
+    except ImportError:
+        return None, None
+    return numpy, sparse
+
+
+def extract_sections(articles, min_chars=MIN_SECTION_CHARS):
+    """Return [(key, heading text, section text, chapter)] for every section with enough text.
+
+    key is (source_file, index of the heading in the article's content).
+    chapter identifies the enclosing top-level heading (the article's
+    highest heading level), so links can skip sections of the same
+    chapter. The articles' content is materialized into lists, as the
+    generator will see it.
+    """
+    sections = []
+    for article_data in articles:
+        source_file = article_data['source_file']
+        content = article_data['data']['content'] = list(blocks_from_dicts(article_data['data']['content']))
+        top_level = min((block.level for block in content if isinstance(block, HeadingBlock)), default=0)
+        chapter = (source_file, None)
+        current = None
+        for index, block in enumerate(content + [None]):
+            if block is None or isinstance(block, HeadingBlock):
+                if current and sum(map(len, current[2])) >= min_chars:
+                    sections.append((current[0], current[1], '\n'.join(current[2]), current[3]))
+                if block is not None:
+                    if block.level <= top_level:
+                        chapter = (source_file, index)
+                    current = ((source_file, index), block.text, [], chapter)
+            elif current and not isinstance(block, CodeBlock):
+                current[2].append(indexed_text(block))
+    # A heading repeated in several chapters ("本章小结", "参考文献") names a
+    # slot of the chapter template, not a topic worth linking
+    title_counts = Counter(title for _, title, _, _ in sections)
+    return [section for section in sections if title_counts[section[1]] < GENERIC_TITLE_COUNT]
+
+
+def tfidf_rows(texts, max_df=0.5):
+    """Return (rows, vocabulary size): each row a {term id: weight} dict with unit L2 norm"""
+    counts = [Counter(tokenize(text)) for text in texts]
+    df = Counter()
+    for row in counts:
+        df.update(row.keys())
+    n = len(texts)
+    limit = max_df * n
+    vocabulary = {}
+    idf = {}
+    for term, frequency in df.items():
+        if frequency <= limit:
+            vocabulary[term] = len(vocabulary)
+            idf[term] = math.log((1 + n) / (1 + frequency)) + 1
+    rows = []
+    for row in counts:
+        weights = {vocabulary[term]: (1 + math.log(count)) * idf[term]
+                   for term, count in row.items() if term in vocabulary}
+        norm = math.sqrt(sum(weight * weight for weight in weights.values())) or 1.0
+        rows.append({term: weight / norm for term, weight in weights.items()})
+    return rows, len(vocabulary)
+
+
+def top_similar_python(rows, chapters, top_k, min_similarity, max_similarity):
+    """Pure Python top-k: dot products accumulated through an inverted index"""
+    postings = {}
+    for i, row in enumerate(rows):
+        for term, weight in row.items():
+            postings.setdefault(term, []).append((i, weight))
+    results = []
+    for i, row in enumerate(rows):
+        scores = {}
+        for term, weight in row.items():
+            for j, other in postings[term]:
+                scores[j] = scores.get(j, 0.0) + weight * other
+        candidates = ((score, j) for j, score in scores.items()
+                      if chapters[j] != chapters[i] and min_similarity <= score < max_similarity)
+        # Ties go to the earlier section
+        best = heapq.nlargest(top_k, candidates, key=lambda pair: (pair[0], -pair[1]))
+        results.append([(j, score) for score, j in best])
+    return results
+
+
+def top_similar_sparse(rows, chapters, vocabulary_size, top_k, min_similarity, max_similarity, block_size=512):
+    """Top-k from blocked sparse matrix products: X[block] @ X.T, one block of rows at a time"""
+    np, sparse = load_sparse()
+    indptr = [0]
+    indices = []
+    data = []
+    for row in rows:
+        indices.extend(row.keys())
+        data.extend(row.values())
+        indptr.append(len(indices))
+    matrix = sparse.csr_matrix((np.array(data, dtype=np.float64), np.array(indices, dtype=np.int64),
+                                np.array(indptr, dtype=np.int64)), shape=(len(rows), vocabulary_size))
+    transposed = matrix.T.tocsc()
+    chapter_ids = {}
+    groups = np.array([chapter_ids.setdefault(chapter, len(chapter_ids)) for chapter in chapters])
+    n = len(rows)
+    k = min(top_k, n - 1)
+    results = []
+    for start in range(0, n, block_size):
+        stop = min(start + block_size, n)
+        scores = (matrix[start:stop] @ transposed).toarray()
+        # Same chapter (which includes the section itself) or outside the score window
+        scores[(groups[start:stop, None] == groups[None, :])
+               | (scores < min_similarity) | (scores >= max_similarity)] = 0.0
+        if k <= 0:
+            results.extend([] for _ in range(start, stop))
+            continue
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        # Best first; ties go to the earlier section, as in the Python path
+        order = np.lexsort((top, -top_scores), axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        for row_top, row_scores in zip(top.tolist(), top_scores.tolist()):
+            results.append([(j, score) for j, score in zip(row_top, row_scores) if score > 0.0])
+    return results
+
+
+def similar_sections(articles, top_k=3, min_similarity=0.1, max_similarity=0.9, max_df=0.5, use_numpy=True):
+    """Link each section to its top_k most similar sections.
+
+    Returns {heading key: [(target heading key, target heading text), ...]},
+    best match first, with keys as in extract_sections.
+    """
+    sections = extract_sections(articles)
+    if len(sections) < 2:
+        return {}
+    rows, vocabulary_size = tfidf_rows([text for _, _, text, _ in sections], max_df)
+    chapters = [chapter for _, _, _, chapter in sections]
+    if use_numpy and load_sparse()[1] is not None:
+        matches = top_similar_sparse(rows, chapters, vocabulary_size, top_k, min_similarity, max_similarity)
+    else:
+        matches = top_similar_python(rows, chapters, top_k, min_similarity, max_similarity)
+    references = {}
+    for (key, _, _, _), row_matches in zip(sections, matches):
+        if row_matches:
+            references[key] = [(sections[j][0], sections[j][1]) for j, _ in row_matches]
+    return references
+
+
+def summary(references):
+    links = sum(map(len, references.values()))
+    backend = 'scipy.sparse' if load_sparse()[1] is not None else 'pure Python'
+    return f"Cross-references: {links} link(s) from {len(references)} section(s) ({backend})"
@@ -0,0 +1,178 @@
+"""Cross-article block deduplication.
+
+html_sources/ holds both the full-text article and the individual part
+articles, so the same chapters can arrive more than once. The
+deduplicator runs between parsing and generation, streaming articles in
+order and keeping the first copy of anything it has seen:
+
+- every block is fingerprinted by a hash of its whitespace-normalized
+  text, and longer blocks also get a bottom-k sketch of their character
+  shingles so near-duplicates (re-wrapped lines, small edits) match too;
+- fingerprints go into hash indexes, so each block is checked against
+  everything seen so far with a few dict lookups instead of pairwise
+  string comparison;
+- an article whose blocks were already seen almost entirely is dropped
+  as a whole;
+- inside a kept article, only a run of at least min_span consecutive
+  already-seen blocks holding at least min_span_bytes of text is dropped.
+  Headings and an article's first block are never dropped and end a run.
+
+Short repeats are kept: each part opens with the same introduction and
+table-of-contents picture as the full text, and dropping them would
+leave whichever copy comes later without its opening.
+"""
+
+from collections import Counter
+import hashlib
+import zlib
+
+from blocks import HeadingBlock, ImageBlock, ListBlock, blocks_from_dicts
+
+# Shingle size and sketch size for near-duplicate detection
+SHINGLE_SIZE = 5
+SKETCH_SIZE = 16
+# A repeated span must be this long to be dropped from an article that is kept
+MIN_SPAN_BLOCKS = 3
+MIN_SPAN_BYTES = 2048
+# Blocks shorter than this (normalized chars) are only matched exactly
+NEAR_MIN_CHARS = 80
+
+
+def block_text(block):
+    """Return the text a block contributes, lists joined by newlines"""
+    if isinstance(block, ListBlock):
+        return '\n'.join(block.items)
+    if isinstance(block, ImageBlock):
+        # The asset path is a content hash, so the same picture matches across sources
+        return block.path or block.src
+    return block.text
+
+
+def normalize(text):
+    return ''.join(text.split()).lower()
+
+
+def fingerprint(block, normalized):
+    return hashlib.blake2b(f"{block.type}:{normalized}".encode('utf-8'), digest_size=8).digest()
+
+
+def sketch(normalized):
+    """Bottom-k sketch of a text's character shingles (crc32 hashes, smallest first)"""
+    shingles = {zlib.crc32(normalized[i:i + SHINGLE_SIZE].encode('utf-8'))
+                for i in range(len(normalized) - SHINGLE_SIZE + 1)}
+    return tuple(sorted(shingles)[:SKETCH_SIZE])
+
+
+def sketch_similarity(a, b):
+    """Estimate the Jaccard similarity of two texts from their bottom-k sketches"""
+    union_bottom = sorted(set(a) | set(b))[:SKETCH_SIZE]
+    both = set(a) & set(b)
+    return sum(1 for value in union_bottom if value in both) / len(union_bottom)
+
+
+class BlockDeduplicator:
+    """Drop blocks and articles already emitted by earlier articles"""
+
+    def __init__(self, min_span=MIN_SPAN_BLOCKS, min_span_bytes=MIN_SPAN_BYTES, containment=0.9,
+                 near_threshold=0.8, key_cache=None):
+        self.min_span = min_span
+        self.min_span_bytes = min_span_bytes
+        self.containment = containment
+        self.near_threshold = near_threshold
+        # (type, text) -> (fingerprint, sketch) from an earlier run, e.g. the
+        # previous rebuild in watch mode; self.keys collects those used this
+        # run. Only kept when a key_cache is passed: the memo holds the text
+        # of every block, which a one-shot streaming run must not accumulate
+        self.key_cache = key_cache
+        self.keys = {} if key_cache is not None else None
+        # exact fingerprints seen so far
+        self.seen = set()
+        # sketch value -> sketches containing it (the near-duplicate index)
+        self.sketch_index = {}
+        self.blocks_removed = 0
+        self.bytes_removed = 0
+        self.articles_removed = 0
+
+    def process(self, articles):
+        """Yield the articles with duplicated spans removed, dropping contained articles"""
+        for article_data in articles:
+            article = article_data['data']
+            blocks = list(blocks_from_dicts(article['content']))
+            keys = [self._keys(block) for block in blocks]
+            seen = [self._is_seen(fp, sk) for fp, sk in keys]
+
+            if blocks and sum(seen) >= self.containment * len(blocks):
+                print(f"Dedup: dropping {article['title']} (contained in earlier articles)")
+                self._count_removed(blocks)
+                self.articles_removed += 1
+                continue
+
+            drop = self._spans_to_drop(blocks, seen)
+            kept = [block for block, dropped in zip(blocks, drop) if not dropped]
+            self._count_removed([block for block, dropped in zip(blocks, drop) if dropped])
+            for fp, sk in keys:
+                self._remember(fp, sk)
+
+            data = dict(article)
+            data['content'] = kept
+            yield dict(article_data, data=data)
+
+    def summary(self):
+        return (f"Dedup removed {self.blocks_removed} block(s), {self.bytes_removed} bytes of text, "
+                f"{self.articles_removed} whole article(s)")
+
+    def _keys(self, block):
+        text = block_text(block)
+        if self.keys is None:
+            return self._compute_keys(block, text)
+        cache_key = (block.type, text)
+        keys = self.keys.get(cache_key) or self.key_cache.get(cache_key)
+        if keys is None:
+            keys = self._compute_keys(block, text)
+        self.keys[cache_key] = keys
+        return keys
+
+    def _compute_keys(self, block, text):
+        normalized = normalize(text)
+        near = sketch(normalized) if len(normalized) >= NEAR_MIN_CHARS else None
+        return fingerprint(block, normalized), near
+
+    def _is_seen(self, fp, sk):
+        if fp in self.seen:
+            return True
+        if not sk:
+            return False
+        # Only sketches sharing a value with this one are compared
+        votes = Counter()
+        for value in sk:
+            for candidate in self.sketch_index.get(value, ()):
+                votes[candidate] += 1
+        return any(sketch_similarity(sk, candidate) >= self.near_threshold
+                   for candidate, _ in votes.most_common(8))
+
+    def _remember(self, fp, sk):
+        self.seen.add(fp)
+        if sk:
+            for value in sk:
+                self.sketch_index.setdefault(value, set()).add(sk)
+
+    def _spans_to_drop(self, blocks, seen):
+        """Mark runs of at least min_span consecutive seen blocks with at least min_span_bytes of text"""
+        # Headings and the opening block stay, so they also split runs
+        droppable = [flag and i > 0 and not isinstance(block, HeadingBlock)
+                     for i, (block, flag) in enumerate(zip(blocks, seen))]
+        drop = [False] * len(seen)
+        start = None
+        for i, flag in enumerate(droppable + [False]):
+            if flag and start is None:
+                start = i
+            elif not flag and start is not None:
+                size = sum(len(block_text(block).encode('utf-8')) for block in blocks[start:i])
+                if i - start >= self.min_span and size >= self.min_span_bytes:
+                    drop[start:i] = [True] * (i - start)
+                start = None
+        return drop
+
+    def _count_removed(self, blocks):
+        self.blocks_removed += len(blocks)
+        self.bytes_removed += sum(len(block_text(block).encode('utf-8')) for block in blocks)
@@ -0,0 +1,65 @@
+"""Render one parsed corpus into several output formats at once.
+
+Parsing, image resolution and dedup happen once; the finished articles
+are then handed to one renderer per requested format (see
+renderers.BookRenderer). With workers > 1 the formats render in a pool
+of worker processes, so adding a format costs its own rendering time on
+a spare core and no extra parsing.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import os
+from pathlib import Path
+
+from blocks import blocks_from_dicts
+from generate_ebook import EnhancedTypstEbookGenerator
+from renderers import EpubRenderer, HtmlRenderer, MarkdownRenderer
+
+RENDERERS = {
+    'typst': EnhancedTypstEbookGenerator,
+    'markdown': MarkdownRenderer,
+    'html': HtmlRenderer,
+    'epub': EpubRenderer,
+}
+
+
+def format_path(output_path, name):
+    """智能体设计模式.typ -> 智能体设计模式.epub"""
+    return Path(output_path).with_suffix(RENDERERS[name].extension)
+
+
+def render_format(name, articles, output_path, cross_references=None):
+    """Render the articles in one format; runs in a worker process, so it only takes picklable arguments"""
+    renderer = RENDERERS[name](articles)
+    if cross_references and hasattr(renderer, 'set_cross_references'):
+        renderer.set_cross_references(cross_references)
+    renderer.save(output_path)
+    return os.path.getsize(output_path)
+
+
+def save_formats(articles, output_path, formats, workers=1, cross_references=None):
+    """Write the articles in every requested format next to output_path.
+
+    Each format gets output_path's name with its own extension.
+    cross_references (see crossref.similar_sections) are used by the
+    formats that can link sections (Typst). Returns {format: path}.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    articles = list(articles)
+    for article_data in articles:
+        # Streamed content is read once here instead of once per format
+        article_data['data']['content'] = list(blocks_from_dicts(article_data['data']['content']))
+    paths = {name: format_path(output_path, name) for name in formats}
+
+    workers = max(1, min(workers or os.cpu_count() or 1, len(paths)))
+    if workers == 1:
+        sizes = [render_format(name, articles, path, cross_references) for name, path in paths.items()]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = [executor.submit(render_format, name, articles, path, cross_references)
+                       for name, path in paths.items()]
+            sizes = [future.result() for future in futures]
+    for (name, path), size in zip(paths.items(), sizes):
+        print(f"  {name:<9} {path.name} ({size / 1024:.1f} KB)")
+    return paths
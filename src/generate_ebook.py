@@ -1,43 +1,70 @@
+import argparse
+import hashlib
 import json
+import os
 from pathlib import Path
 import re
-from datetime import datetime
 
-class EnhancedTypstEbookGenerator:
+from blocks import block_from_dict, blocks_from_dicts
+from code_language import guess_language
+from dedup import BlockDeduplicator
+from images import ImagePipeline
+from metrics import metrics
+from renderers import BookRenderer, code_fence
+
+# Characters with markup meaning in Typst text, each escaped with a backslash
+TYPST_ESCAPES = {char: '\\' + char for char in '\\#$_*[]<>@'}
+TYPST_SPECIAL_RE = re.compile('[' + re.escape(''.join(TYPST_ESCAPES)) + ']')
+
+
+def xref_label(key):
+    """Typst label for the heading at key = (source_file, block index), see crossref.similar_sections"""
+    source_file, index = key
+    return f"xref-{hashlib.sha1(source_file.encode('utf-8')).hexdigest()[:8]}-{index}"
+
+
+class EnhancedTypstEbookGenerator(BookRenderer):
     """Enhanced Typst e-book generator with professional formatting based on Typst best practices."""
     
+    extension = '.typ'
+    
     def __init__(self, articles_data):
-        self.articles = articles_data
-        self.book_title = "智能体设计模式"
-        self.book_subtitle = "构建智能系统的实践指南"
-        self.author = "知乎专栏"
-        self.date = datetime.now().strftime("%Y年%m月")
+        super().__init__(articles_data)
+        # heading key -> [(target heading key, target title)], see set_cross_references
+        self.cross_references = {}
+        self.xref_targets = set()
+    
+    def set_cross_references(self, references):
+        """Emit "see also" links under headings, from crossref.similar_sections() output.
         
+        Targets get a Typst label and are cited with @label. Links to
+        sections outside this book (another volume) are dropped, so
+        articles must be a list here.
+        """
+        sources = {article_data['source_file'] for article_data in self.articles}
+        self.cross_references = {}
+        for key, links in references.items():
+            links = [(target, title) for target, title in links if target[0] in sources]
+            if key[0] in sources and links:
+                self.cross_references[key] = links
+        self.xref_targets = {target for links in self.cross_references.values() for target, _ in links}
+    
     def escape_typst(self, text):
-        """Escape special characters for Typst"""
+        """Escape special characters for Typst in a single pass"""
+        if metrics.enabled:
+            metrics.count('generate.escape_calls')
         if not text:
             return ""
-        # Escape backslashes first
-        text = text.replace('\\', '\\\\')
-        # Escape other special characters
-        replacements = {
-            '#': '\\#',
-            '$': '\\$',
-            '_': '\\_',
-            '*': '\\*',
-            '[': '\\[',
-            ']': '\\]',
-            '<': '\\<',
-            '>': '\\>',
-            '@': '\\@',
-        }
-        for old, new in replacements.items():
-            text = text.replace(old, new)
-        return text
-    
-    def format_heading(self, level, text):
-        """Format heading for Typst"""
+        # Most paragraphs contain no special characters at all
+        if not TYPST_SPECIAL_RE.search(text):
+            return text
+        return TYPST_SPECIAL_RE.sub(lambda match: TYPST_ESCAPES[match.group()], text)
+    
+    def format_heading(self, level, text, label=None):
+        """Format heading for Typst, optionally with a <label> to reference it by"""
         prefix = '=' * min(level, 6)
+        if label:
+            return f"{prefix} {self.escape_typst(text)} <{label}>\n\n"
         return f"{prefix} {self.escape_typst(text)}\n\n"
     
     def format_paragraph(self, text):
@@ -56,11 +83,19 @@ class EnhancedTypstEbookGenerator:
                 result.append(f"- {escaped_item}")
         return '\n'.join(result) + '\n\n'
     
-    def format_code(self, code, lang="python"):
-        """Format code block for Typst with syntax highlighting hint"""
+    def format_code(self, code, lang=None):
+        """Format code block for Typst; the language is guessed when not given.
+        
+        The box around it comes from the raw block show rule in
+        generate_document_setup, so each block is just a fenced raw block.
+        """
         # Clean up the code
         code = code.strip()
-        return f"#block(\n  fill: luma(245),\n  inset: 10pt,\n  radius: 4pt,\n  width: 100%,\n)[\n```{lang}\n{code}\n```\n]\n\n"
+        if lang is None:
+            lang = guess_language(code)
+        # A raw block ends at the first run of backticks as long as its opening fence
+        fence = code_fence(code)
+        return f"{fence}{lang}\n{code}\n{fence}\n\n"
     
     def format_quote(self, text):
         """Format quote block for Typst with styled box"""
@@ -76,6 +111,48 @@ class EnhancedTypstEbookGenerator:
 
 """
     
+    def format_image(self, path, caption=""):
+        """Format an image as a figure with an optional caption"""
+        # Zhihu captions carry their own "图1：" numbering
+        figure = f'#figure(\n  image("{path}"),\n  numbering: none,\n'
+        if caption:
+            figure += f"  caption: [{self.escape_typst(caption)}],\n"
+        return figure + ")\n\n"
+    
+    def format_see_also(self, links):
+        """Format a line of @references to related sections"""
+        references = '；'.join(f"@{xref_label(key)} {self.escape_typst(title)}" for key, title in links)
+        return f"#text(size: 9pt, fill: luma(110))[另见：{references}]\n\n"
+    
+    def render_heading(self, block):
+        # Article headings sit one level below the chapter title
+        level = min(block.level + 1, 6)
+        if not self.xref_targets:
+            return self.format_heading(level, block.text)
+        position = self.block_position
+        label = xref_label(position) if position in self.xref_targets else None
+        heading = self.format_heading(level, block.text, label)
+        links = self.cross_references.get(position)
+        if links:
+            heading += self.format_see_also(links)
+        return heading
+    
+    def render_paragraph(self, block):
+        return self.format_paragraph(block.text)
+    
+    def render_list(self, block):
+        return self.format_list(block.items, block.ordered)
+    
+    def render_code(self, block):
+        return self.format_code(block.text)
+    
+    def render_quote(self, block):
+        return self.format_quote(block.text)
+    
+    def render_image(self, block):
+        # Images the pipeline could not resolve to a local asset are left out
+        return self.format_image(block.path, block.caption) if block.path else ""
+    
     def generate_document_setup(self):
         """Generate document setup and styling rules"""
         return f'''// ============================================================
@@ -166,10 +243,16 @@ class EnhancedTypstEbookGenerator:
   it
 }}
 
-// 代码块样式
+// 代码块样式（所有代码块共用一条规则）
 #show raw.where(block: true): it => {{
   set text(font: ("Consolas", "Source Code Pro", "Courier New"), size: 9pt)
-  it
+  block(
+    fill: luma(245),
+    inset: 10pt,
+    radius: 4pt,
+    width: 100%,
+    it,
+  )
 }}
 
 // 行内代码样式
@@ -235,7 +318,7 @@ class EnhancedTypstEbookGenerator:
           size: 18pt,
           fill: white.transparentize(20%),
         )[{self.book_subtitle}]
-        
+        {self._title_page_volume()}
         #v(3em)
         
         // 装饰线
@@ -263,6 +346,19 @@ class EnhancedTypstEbookGenerator:
 
 '''
     
+    def _title_page_volume(self):
+        if not self.volume_label:
+            return ""
+        return f"""
+        #v(1em)
+        
+        // 分卷
+        #text(
+          size: 16pt,
+          fill: white.transparentize(20%),
+        )[{self.volume_label}]
+        """
+    
     def generate_toc(self):
         """Generate table of contents page"""
         return '''
@@ -306,42 +402,29 @@ class EnhancedTypstEbookGenerator:
     
     def generate_typst(self):
         """Generate complete Typst document with enhanced formatting"""
-        parts = []
-        
+        with metrics.timer('generate.generate_typst'):
+            return ''.join(self.iter_typst())
+    
+    def iter_document(self):
+        return self.iter_typst()
+    
+    def iter_typst(self):
+        """Yield the Typst document fragment by fragment, without holding it all in memory"""
         # Document setup
-        parts.append(self.generate_document_setup())
+        yield self.generate_document_setup()
         
         # Title page
-        parts.append(self.generate_title_page())
+        yield self.generate_title_page()
         
         # Table of contents
-        parts.append(self.generate_toc())
+        yield self.generate_toc()
         
         # Process each article as a chapter
         for idx, article_data in enumerate(self.articles, 1):
-            article = article_data['data']
-            
-            # Chapter header
-            parts.append(self.generate_chapter_header(article['title'], idx))
-            
-            # Process content
-            for item in article['content']:
-                if item['type'] == 'heading':
-                    level = min(item['level'] + 1, 6)
-                    parts.append(self.format_heading(level, item['text']))
-                elif item['type'] == 'paragraph':
-                    parts.append(self.format_paragraph(item['text']))
-                elif item['type'] == 'list':
-                    parts.append(self.format_list(item['items'], item.get('ordered', False)))
-                elif item['type'] == 'code':
-                    parts.append(self.format_code(item['text']))
-                elif item['type'] == 'quote':
-                    parts.append(self.format_quote(item['text']))
+            yield from self.iter_chapter(article_data, idx)
         
         # Colophon / end page
-        parts.append(self.generate_colophon())
-        
-        return ''.join(parts)
+        yield self.generate_colophon()
     
     def generate_colophon(self):
         """Generate colophon (end page with book info)"""
@@ -361,7 +444,7 @@ class EnhancedTypstEbookGenerator:
     #text(size: 14pt, weight: "bold")[{self.book_title}]
     
     #text(size: 11pt)[{self.book_subtitle}]
-    
+    {self._colophon_volume()}
     #v(1.5em)
     
     #text(size: 10pt, fill: luma(100))[
@@ -378,12 +461,140 @@ class EnhancedTypstEbookGenerator:
 ]
 '''
     
-    def save_typst(self, output_path):
-        """Save Typst document to file"""
-        content = self.generate_typst()
-        with open(output_path, 'w', encoding='utf-8') as f:
-            f.write(content)
+    def _colophon_volume(self):
+        if not self.volume_label:
+            return ""
+        return f"""
+    #text(size: 11pt)[{self.volume_label}]
+    """
+    
+    def save(self, output_path):
+        self.save_typst(output_path)
+    
+    def save_typst(self, output_path, flush_size=64 * 1024):
+        """Save Typst document to file, streaming fragments out in chunks of about flush_size characters"""
+        pending = []
+        pending_size = 0
+        with metrics.timer('generate.save_typst'), open(output_path, 'w', encoding='utf-8') as f:
+            for fragment in self.iter_typst():
+                pending.append(fragment)
+                pending_size += len(fragment)
+                if pending_size >= flush_size:
+                    with metrics.timer('generate.write'):
+                        f.write(''.join(pending))
+                    pending.clear()
+                    pending_size = 0
+            with metrics.timer('generate.write'):
+                f.write(''.join(pending))
+        metrics.count('generate.output_bytes', os.path.getsize(output_path))
         print(f"Typst document saved to {output_path}")
+    
+    def save_typst_split(self, output_path, chapters_dirname="chapters"):
+        """Save a master file that #includes one file per chapter.
+        
+        The master holds the setup, title page, TOC and colophon; chapter
+        files live in chapters_dirname next to it. A file is only rewritten
+        when its content hash changes, so unchanged chapters keep their mtime
+        and Typst recompiles just the chapters that changed. Returns
+        (files written, files unchanged).
+        """
+        output_path = Path(output_path)
+        chapters_dir = output_path.parent / chapters_dirname
+        chapters_dir.mkdir(parents=True, exist_ok=True)
+        written = unchanged = 0
+        includes = []
+        with metrics.timer('generate.save_typst_split'):
+            for idx, article_data in enumerate(self.articles, 1):
+                name = f"chapter-{idx:03d}.typ"
+                includes.append(f'#include "{chapters_dirname}/{name}"\n')
+                if write_if_changed(chapters_dir / name, ''.join(self.iter_chapter(article_data, idx))):
+                    written += 1
+                else:
+                    unchanged += 1
+            
+            # Chapters left over from a longer book would otherwise linger
+            current = {f"chapter-{idx:03d}.typ" for idx in range(1, len(includes) + 1)}
+            for stale in chapters_dir.glob("chapter-*.typ"):
+                if stale.name not in current:
+                    stale.unlink()
+            
+            master = ''.join([
+                self.generate_document_setup(),
+                self.generate_title_page(),
+                self.generate_toc(),
+                *includes,
+                self.generate_colophon(),
+            ])
+            if write_if_changed(output_path, master):
+                written += 1
+            else:
+                unchanged += 1
+        metrics.count('generate.files_written', written)
+        metrics.count('generate.files_unchanged', unchanged)
+        print(f"Typst document saved to {output_path} "
+              f"({len(includes)} chapter file(s) in {chapters_dir}; {written} written, {unchanged} unchanged)")
+        return written, unchanged
+
+
+def write_if_changed(path, text):
+    """Write text to path unless the file already has the same content hash; return True if written"""
+    data = text.encode('utf-8')
+    try:
+        with open(path, 'rb') as f:
+            if hashlib.sha256(f.read()).digest() == hashlib.sha256(data).digest():
+                return False
+    except FileNotFoundError:
+        pass
+    tmp_path = Path(f"{path}.tmp")
+    with open(tmp_path, 'wb') as f:
+        f.write(data)
+    os.replace(tmp_path, path)
+    return True
+
+
+def iter_articles_jsonl(data_path):
+    """Lazily read articles from an articles_data.jsonl file.
+
+    Yields entries shaped like those in articles_data.json, except that each
+    article's 'content' is an iterator streaming typed blocks from the file.
+    Only one block is held in memory at a time, so each article's content
+    has to be consumed before moving on to the next article (anything left
+    unread is skipped).
+    """
+    with open(data_path, 'r', encoding='utf-8') as f:
+        records = (json.loads(line) for line in f if line.strip())
+        state = {'next': next(records, None)}
+        
+        def blocks():
+            for record in records:
+                if record['type'] == 'article':
+                    state['next'] = record
+                    return
+                block = block_from_dict(record)
+                if block is not None:
+                    yield block
+            state['next'] = None
+        
+        while state['next'] is not None:
+            header = state['next']
+            state['next'] = None
+            content = blocks()
+            data = {key: value for key, value in header.items() if key not in ('type', 'source_file')}
+            data['content'] = content
+            yield {'source_file': header['source_file'], 'data': data}
+            for _ in content:
+                pass
+
+
+def load_articles(data_path):
+    """Load articles from articles_data.jsonl (lazily) or a legacy articles_data.json"""
+    if Path(data_path).suffix == '.jsonl':
+        return iter_articles_jsonl(data_path)
+    with open(data_path, 'r', encoding='utf-8') as f:
+        articles = json.load(f)
+    for article in articles:
+        article['data']['content'] = list(blocks_from_dicts(article['data']['content']))
+    return articles
 
 
 # Keep the old class for backward compatibility
@@ -392,34 +603,70 @@ class TypstEbookGenerator(EnhancedTypstEbookGenerator):
     pass
 
 def main():
+    arg_parser = argparse.ArgumentParser(description="Generate the Typst e-book from the parsed articles")
+    arg_parser.add_argument('--no-dedup', action='store_true',
+                            help="keep blocks that repeat content from earlier articles")
+    arg_parser.add_argument('--no-images', action='store_true',
+                            help="leave images out instead of copying them into output/images/")
+    arg_parser.add_argument('--split', action='store_true',
+                            help="write one file per chapter under output/chapters/, rewriting only changed ones")
+    args = arg_parser.parse_args()
+    
     # Set up paths for new directory structure
     base_dir = Path(__file__).parent.parent
     output_dir = base_dir / "output"
     
-    # Look for articles_data.json in output directory first, then current directory
-    data_path = output_dir / "articles_data.json"
-    if not data_path.exists():
-        data_path = Path(__file__).parent / "articles_data.json"
+    # Look for the parsed data in the output directory first, then the current
+    # directory; the streamed .jsonl is preferred unless the .json is newer
+    data_path = None
+    for data_dir in (output_dir, Path(__file__).parent):
+        candidates = [data_dir / name for name in ("articles_data.jsonl", "articles_data.json")]
+        candidates = [path for path in candidates if path.exists()]
+        if candidates:
+            data_path = max(candidates, key=lambda path: path.stat().st_mtime)
+            break
     
-    if not data_path.exists():
-        print(f"Error: articles_data.json not found.")
+    if data_path is None:
+        print(f"Error: articles_data.jsonl / articles_data.json not found.")
         print(f"Please run 'python src/parse_local_html.py' first.")
         return
     
-    with open(data_path, 'r', encoding='utf-8') as f:
-        articles = json.load(f)
-    
-    if not articles:
+    if data_path.stat().st_size == 0:
+        print("No articles found in data file")
+        return
+    articles = load_articles(data_path)
+    if isinstance(articles, list) and not articles:
         print("No articles found in data file")
         return
     
     # Ensure output directory exists
     output_dir.mkdir(exist_ok=True)
     
+    # Map images to their local files under html_sources/ and compress them
+    # into output/images/ (before dedup, so identical images match)
+    images = None
+    if not args.no_images:
+        images = ImagePipeline(output_dir / "images")
+        articles = images.process(articles, base_dir / "html_sources")
+    
+    # Drop spans (or whole articles) that repeat earlier articles, e.g. the
+    # full-text post overlapping the individual parts
+    deduplicator = None
+    if not args.no_dedup:
+        deduplicator = BlockDeduplicator()
+        articles = deduplicator.process(articles)
+    
     # Generate Typst e-book
     generator = EnhancedTypstEbookGenerator(articles)
     output_path = output_dir / "智能体设计模式.typ"
-    generator.save_typst(output_path)
+    if args.split:
+        generator.save_typst_split(output_path)
+    else:
+        generator.save_typst(output_path)
+    if images:
+        print(images.summary())
+    if deduplicator:
+        print(deduplicator.summary())
     
     print(f"\nE-book generated successfully!")
     print(f"To compile to PDF, run:")
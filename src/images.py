@@ -0,0 +1,193 @@
+"""Local image pipeline for the e-book.
+
+Saved Zhihu pages keep their images in a `<page>_files` folder beside the
+HTML, usually as several renditions of the same picture
+(v2-<token>_1440w.jpg, _720w, _250x0, the untouched original, ...). The
+pipeline runs between parsing and generation:
+
+- every ImageBlock is mapped to its local file, and the largest rendition
+  of the same token in that folder is picked instead;
+- the picked files are hashed, so an image shared by several sources
+  (the full-text post and a part post) becomes one asset;
+- each distinct image is downscaled to max_width and recompressed once,
+  on a thread pool, into the asset directory under its content hash, so
+  later builds reuse it as long as the source bytes are unchanged.
+
+Resizing needs Pillow; without it the picked files are copied unchanged.
+Blocks whose file cannot be found keep an empty path and are left out of
+the book.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+import hashlib
+import os
+from pathlib import Path
+import re
+import shutil
+from urllib.parse import unquote
+
+from blocks import ImageBlock, blocks_from_dicts
+from metrics import metrics
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+# v2-<token>[_<rendition>][(n)].<ext> as saved by the browser
+VARIANT_RE = re.compile(r'^(v2-[0-9a-f]{32})(?:_([0-9a-z]+))?(?:\(\d+\))?\.\w+$')
+RENDITION_WIDTH_RE = re.compile(r'^(\d+)(?:w|x\d+)$')
+# Zhihu's named renditions, by approximate pixel width; no suffix or _r is the original
+NAMED_WIDTHS = {None: 100000, 'r': 100000, 'qhd': 2560, 'hd': 1920, 'xl': 1280, 'b': 600, 'l': 100, 's': 50}
+# Leading bytes of the formats Typst can embed -> file extension
+MAGIC_NUMBERS = (
+    (b'\xff\xd8\xff', '.jpg'),
+    (b'\x89PNG\r\n\x1a\n', '.png'),
+    (b'GIF87a', '.gif'),
+    (b'GIF89a', '.gif'),
+)
+
+
+def rendition_width(name):
+    """Approximate pixel width of a saved rendition, from its file name (0 if unknown)"""
+    match = VARIANT_RE.match(name)
+    if not match:
+        return 0
+    rendition = match.group(2)
+    if rendition in NAMED_WIDTHS:
+        return NAMED_WIDTHS[rendition]
+    width = RENDITION_WIDTH_RE.match(rendition)
+    return int(width.group(1)) if width else 0
+
+
+def image_extension(data):
+    """Return the extension for image bytes, or None if Typst cannot embed them"""
+    for magic, extension in MAGIC_NUMBERS:
+        if data.startswith(magic):
+            return extension
+    return None
+
+
+class ImagePipeline:
+    """Resolve, deduplicate and compress the images referenced by parsed articles"""
+
+    def __init__(self, asset_dir, max_width=1200, jpeg_quality=82, workers=4):
+        self.asset_dir = Path(asset_dir)
+        self.max_width = max_width
+        self.jpeg_quality = jpeg_quality
+        self.workers = workers
+        # folder -> {token: [renditions]}, listed once per folder
+        self.renditions = {}
+        # picked source file -> asset name
+        self.assets = {}
+        self.images_found = 0
+        self.images_missing = 0
+        self.images_converted = 0
+
+    def process(self, articles, html_dir):
+        """Yield the articles with ImageBlock.path filled in, converting new images in the background.
+
+        Paths are relative to the asset directory's parent and start with
+        '/', which Typst resolves from the project root, so they work from
+        the master file and from the chapter files of a split build alike.
+        Asset names only depend on the source bytes, so paths are known
+        before conversion finishes; all conversions are done once the
+        generator is exhausted.
+        """
+        html_dir = Path(html_dir)
+        prefix = f"/{self.asset_dir.name}/"
+        submitted = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            for article_data in articles:
+                article = article_data['data']
+                article['content'] = list(blocks_from_dicts(article['content']))
+                base = (html_dir / article_data['source_file']).parent
+                with metrics.timer('images.resolve'):
+                    for block in article['content']:
+                        if not isinstance(block, ImageBlock):
+                            continue
+                        self.images_found += 1
+                        source = self.resolve(base, block.src)
+                        name = self.asset_name(source) if source else None
+                        if name is None:
+                            self.images_missing += 1
+                            continue
+                        block.path = prefix + name
+                        if name not in submitted and not (self.asset_dir / name).exists():
+                            self.asset_dir.mkdir(parents=True, exist_ok=True)
+                            submitted[name] = executor.submit(self.convert, source, name)
+                yield article_data
+        for name, future in submitted.items():
+            error = future.exception()
+            if error:
+                print(f"Error converting image {name}: {error}")
+            else:
+                self.images_converted += 1
+
+    def resolve(self, base, src):
+        """Return the largest local rendition of the image src points at, or None"""
+        if src.startswith(('http:', 'https:', '//', 'data:')):
+            return None
+        path = base / unquote(src)
+        match = VARIANT_RE.match(path.name)
+        if not match:
+            return path if path.is_file() else None
+        folder = path.parent
+        if folder not in self.renditions:
+            by_token = {}
+            if folder.is_dir():
+                for entry in folder.iterdir():
+                    entry_match = VARIANT_RE.match(entry.name)
+                    if entry_match:
+                        by_token.setdefault(entry_match.group(1), []).append(entry)
+            self.renditions[folder] = by_token
+        candidates = self.renditions[folder].get(match.group(1))
+        if not candidates:
+            return None
+        return max(candidates, key=lambda entry: (rendition_width(entry.name), entry.stat().st_size))
+
+    def asset_name(self, source):
+        """Content-hash file name for a source image, or None if it is not an embeddable image"""
+        if source not in self.assets:
+            with open(source, 'rb') as f:
+                data = f.read()
+            extension = image_extension(data)
+            if extension is None:
+                self.assets[source] = None
+            else:
+                self.assets[source] = hashlib.sha256(data).hexdigest()[:16] + extension
+        return self.assets[source]
+
+    def convert(self, source, name):
+        """Write one downscaled, recompressed copy of source into the asset directory"""
+        with metrics.timer('images.convert'):
+            self._convert(source, name)
+
+    def _convert(self, source, name):
+        target = self.asset_dir / name
+        tmp_path = target.with_name(target.name + '.tmp')
+        if Image is None or target.suffix == '.gif':
+            shutil.copyfile(source, tmp_path)
+            os.replace(tmp_path, target)
+            return
+        try:
+            with Image.open(source) as image:
+                if image.width > self.max_width:
+                    image.thumbnail((self.max_width, image.height))
+                if target.suffix == '.jpg':
+                    image.convert('RGB').save(tmp_path, 'JPEG', quality=self.jpeg_quality,
+                                              optimize=True, progressive=True)
+                else:
+                    image.save(tmp_path, 'PNG', optimize=True)
+        except OSError as e:
+            # Truncated or unusual files: embed them as they are
+            print(f"Could not recompress {source.name} ({e}), copying it unchanged")
+            shutil.copyfile(source, tmp_path)
+        # Never keep a recompressed copy that came out larger than the source
+        if os.path.getsize(tmp_path) > os.path.getsize(source):
+            shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, target)
+
+    def summary(self):
+        return (f"Images: {self.images_found} referenced, {len(set(filter(None, self.assets.values())))} distinct, "
+                f"{self.images_converted} converted, {self.images_missing} missing")
@@ -0,0 +1,99 @@
+"""Lightweight timers and counters for profiling the parse and generate stages.
+
+Instrumentation is off by default and costs one attribute check per call
+site while off. Turn it on with metrics.enable() (build.py --profile does
+this), then read metrics.report() or write it with metrics.save(path).
+
+Only the current process is measured: articles parsed by a process pool
+(workers > 1) are not counted, so profile with a single worker.
+"""
+
+import json
+from pathlib import Path
+import time
+
+
+class _Timer:
+    __slots__ = ('metrics', 'name', 'start')
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.metrics.add_time(self.name, time.perf_counter() - self.start)
+        return False
+
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        return False
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Metrics:
+    """Accumulates named wall-clock timers and counters"""
+
+    def __init__(self):
+        self.enabled = False
+        self.reset()
+
+    def enable(self, enabled=True):
+        self.enabled = enabled
+
+    def reset(self):
+        self.timers = {}
+        self.counters = {}
+
+    def timer(self, name):
+        """Context manager adding the time spent inside it to timer `name`"""
+        if not self.enabled:
+            return _NULL_TIMER
+        return _Timer(self, name)
+
+    def add_time(self, name, seconds):
+        total, calls = self.timers.get(name, (0.0, 0))
+        self.timers[name] = (total + seconds, calls + 1)
+
+    def count(self, name, amount=1):
+        if self.enabled:
+            self.counters[name] = self.counters.get(name, 0) + amount
+
+    def report(self):
+        return {
+            'timers': {
+                name: {'seconds': round(total, 6), 'calls': calls}
+                for name, (total, calls) in sorted(self.timers.items())
+            },
+            'counters': dict(sorted(self.counters.items())),
+        }
+
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, ensure_ascii=False, indent=2)
+
+    def format_report(self):
+        """Return the report as aligned text lines for printing"""
+        lines = []
+        for name, (total, calls) in sorted(self.timers.items()):
+            lines.append(f"  {name:<28} {total:9.4f}s  ({calls} call{'s' if calls != 1 else ''})")
+        for name, value in sorted(self.counters.items()):
+            lines.append(f"  {name:<28} {value:>10}")
+        return '\n'.join(lines)
+
+
+# Process-wide instance used by the parser and generator
+metrics = Metrics()
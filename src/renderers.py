@@ -0,0 +1,347 @@
+"""Output formats for the parsed articles.
+
+BookRenderer holds what every format shares: the book metadata, the
+block class -> render method table and the chapter walk. A format
+subclass supplies the render_* methods, a chapter header and
+iter_document(), and sets `extension`; save() streams the document to a
+file. EnhancedTypstEbookGenerator (generate_ebook.py) is the Typst
+format; this module adds Markdown, a standalone HTML page and EPUB 3.
+
+Image blocks carry root-relative asset paths ("/images/<hash>.jpg", see
+ImagePipeline); the text formats refer to them relative to the output
+directory, and EPUB packs the files into the book.
+"""
+
+from datetime import datetime, timezone
+import html
+import os
+from pathlib import Path
+import re
+import uuid
+import zipfile
+
+from blocks import CodeBlock, HeadingBlock, ImageBlock, ListBlock, ParagraphBlock, QuoteBlock, blocks_from_dicts
+from code_language import guess_language
+from metrics import metrics
+
+BACKTICK_RUN_RE = re.compile('`{3,}')
+# ASCII punctuation with a meaning in Markdown; CommonMark allows a backslash before any of it
+MARKDOWN_SPECIAL_RE = re.compile(r'([\\`*_\[\]<>#|])')
+# Characters that only mean something at the start of a line: "1." / "1)" lists,
+# "-" / "+" bullets, "=" / "-" setext underlines and "~~~" fences
+MARKDOWN_ORDERED_MARKER_RE = re.compile(r'^([ \t]*\d+)([.)])', re.MULTILINE)
+MARKDOWN_LINE_MARKER_RE = re.compile(r'^([ \t]*)([-+=~])', re.MULTILINE)
+MEDIA_TYPES = {'.jpg': 'image/jpeg', '.png': 'image/png', '.gif': 'image/gif'}
+
+HTML_STYLE = """
+body { max-width: 46em; margin: 0 auto; padding: 2em 1.5em; font: 16px/1.8 "Noto Serif CJK SC", "Source Han Serif SC", serif; color: #1a1a1a; }
+h1, h2, h3, h4, h5, h6 { font-family: "Noto Sans CJK SC", "Source Han Sans SC", sans-serif; color: #1e3a5f; line-height: 1.4; }
+h1 { border-bottom: 2px solid #1e3a5f; padding-bottom: 0.3em; margin-top: 2.5em; }
+pre { background: #f5f5f5; padding: 10px; border-radius: 4px; overflow-x: auto; font-size: 0.85em; line-height: 1.5; }
+code { font-family: "JetBrains Mono", "Fira Code", monospace; }
+blockquote { background: #f0f7ff; border-left: 3px solid #3b82f6; margin: 1em 0; padding: 10px 12px; font-style: italic; }
+figure { margin: 1.5em 0; text-align: center; }
+figure img { max-width: 100%; }
+figcaption { font-size: 0.9em; color: #666; }
+.title-page { text-align: center; margin: 4em 0; }
+.title-page .subtitle { font-size: 1.3em; }
+.meta, .colophon { color: #666; font-size: 0.9em; text-align: center; }
+"""
+
+
+def code_fence(code):
+    """Return a backtick fence longer than any backtick run inside code"""
+    if "```" not in code:
+        return "```"
+    return "`" * (max(len(run) for run in BACKTICK_RUN_RE.findall(code)) + 1)
+
+
+def asset_href(path):
+    """Root-relative asset path -> path relative to the output directory"""
+    return path.lstrip('/')
+
+
+class BookRenderer:
+    """Base class for output formats: walks the articles and dispatches each block to a render_* method"""
+
+    # File extension of the rendered book, including the dot
+    extension = ''
+
+    def __init__(self, articles_data):
+        # A list, or a one-shot iterator such as iter_articles_jsonl() for a single streaming pass
+        self.articles = articles_data
+        self.book_title = "智能体设计模式"
+        self.book_subtitle = "构建智能系统的实践指南"
+        self.author = "知乎专栏"
+        self.date = datetime.now().strftime("%Y年%m月")
+        # Set for one volume of a multi-volume book, e.g. "第 2 卷（共 3 卷）"
+        self.volume_label = ""
+        # (source_file, index) of the block being rendered, for data keyed by position
+        self.block_position = None
+        # Block class -> renderer, so each block costs one dict lookup instead of an if/elif chain
+        self.block_renderers = {
+            HeadingBlock: self.render_heading,
+            ParagraphBlock: self.render_paragraph,
+            ListBlock: self.render_list,
+            CodeBlock: self.render_code,
+            QuoteBlock: self.render_quote,
+            ImageBlock: self.render_image,
+        }
+
+    def iter_chapter(self, article_data, chapter_num):
+        """Yield one chapter: its header followed by the rendered blocks"""
+        article = article_data['data']
+        renderers = self.block_renderers
+
+        # Chapter header
+        yield self.generate_chapter_header(article['title'], chapter_num)
+
+        # Process content (plain dict blocks are still accepted)
+        source_file = article_data.get('source_file')
+        for index, block in enumerate(blocks_from_dicts(article['content'])):
+            renderer = renderers.get(type(block))
+            if renderer:
+                metrics.count('generate.blocks_rendered')
+                self.block_position = (source_file, index)
+                yield renderer(block)
+
+    def iter_document(self):
+        """Yield the whole document fragment by fragment"""
+        raise NotImplementedError
+
+    def save(self, output_path):
+        """Write the document to output_path"""
+        with open(output_path, 'w', encoding='utf-8') as f:
+            f.writelines(self.iter_document())
+        print(f"{type(self).__name__}: saved to {output_path}")
+
+
+class MarkdownRenderer(BookRenderer):
+    """CommonMark with fenced code blocks; chapters are level-1 headings"""
+
+    extension = '.md'
+
+    def escape(self, text):
+        if not text:
+            return ""
+        text = MARKDOWN_SPECIAL_RE.sub(r'\\\1', text)
+        text = MARKDOWN_ORDERED_MARKER_RE.sub(r'\1\\\2', text)
+        return MARKDOWN_LINE_MARKER_RE.sub(r'\1\\\2', text)
+
+    def render_heading(self, block):
+        # Article headings sit one level below the chapter title
+        return f"{'#' * min(block.level + 1, 6)} {self.escape(block.text)}\n\n"
+
+    def render_paragraph(self, block):
+        return f"{self.escape(block.text)}\n\n"
+
+    def render_list(self, block):
+        lines = []
+        for i, item in enumerate(block.items, 1):
+            marker = f"{i}." if block.ordered else "-"
+            lines.append(f"{marker} {self.escape(item)}")
+        return '\n'.join(lines) + '\n\n'
+
+    def render_code(self, block):
+        code = block.text.strip()
+        fence = code_fence(code)
+        return f"{fence}{guess_language(code)}\n{code}\n{fence}\n\n"
+
+    def render_quote(self, block):
+        lines = self.escape(block.text).splitlines() or [""]
+        return '\n'.join(f"> {line}" for line in lines) + '\n\n'
+
+    def render_image(self, block):
+        if not block.path:
+            return ""
+        image = f"![{self.escape(block.caption)}]({asset_href(block.path)})\n\n"
+        if block.caption:
+            image += f"*{self.escape(block.caption)}*\n\n"
+        return image
+
+    def generate_chapter_header(self, title, chapter_num):
+        return f'<a id="chapter-{chapter_num}"></a>\n\n# {self.escape(title)}\n\n'
+
+    def iter_document(self):
+        yield f"# {self.book_title}\n\n**{self.book_subtitle}**\n\n"
+        if self.volume_label:
+            yield f"{self.volume_label}\n\n"
+        yield f"来源：{self.author} · {self.date}\n\n"
+
+        # The TOC needs the titles first, so the articles are walked twice
+        articles = list(self.articles)
+        yield "## 目录\n\n"
+        for idx, article_data in enumerate(articles, 1):
+            yield f"{idx}. [{self.escape(article_data['data']['title'])}](#chapter-{idx})\n"
+        yield "\n"
+
+        for idx, article_data in enumerate(articles, 1):
+            yield from self.iter_chapter(article_data, idx)
+
+        yield f"---\n\n本电子书内容来源于知乎专栏文章，仅供个人学习参考使用。生成日期：{self.date}\n"
+
+
+class HtmlRenderer(BookRenderer):
+    """A single self-contained HTML page with an inline stylesheet and a linked TOC.
+
+    Markup is kept well-formed XML so EpubRenderer can reuse the block
+    rendering for its XHTML chapters.
+    """
+
+    extension = '.html'
+
+    def escape(self, text):
+        return html.escape(text) if text else ""
+
+    def render_heading(self, block):
+        level = min(block.level + 1, 6)
+        return f"<h{level}>{self.escape(block.text)}</h{level}>\n"
+
+    def render_paragraph(self, block):
+        return f"<p>{self.escape(block.text)}</p>\n"
+
+    def render_list(self, block):
+        tag = 'ol' if block.ordered else 'ul'
+        items = ''.join(f"<li>{self.escape(item)}</li>\n" for item in block.items)
+        return f"<{tag}>\n{items}</{tag}>\n"
+
+    def render_code(self, block):
+        code = block.text.strip()
+        language = guess_language(code)
+        attr = f' class="language-{language}"' if language else ''
+        return f"<pre><code{attr}>{self.escape(code)}</code></pre>\n"
+
+    def render_quote(self, block):
+        return f"<blockquote><p>{self.escape(block.text)}</p></blockquote>\n"
+
+    def render_image(self, block):
+        if not block.path:
+            return ""
+        figure = f'<figure><img src="{self.escape(asset_href(block.path))}" alt="{self.escape(block.caption)}" />'
+        if block.caption:
+            figure += f"<figcaption>{self.escape(block.caption)}</figcaption>"
+        return figure + "</figure>\n"
+
+    def generate_chapter_header(self, title, chapter_num):
+        return f'<h1 id="chapter-{chapter_num}">{self.escape(title)}</h1>\n'
+
+    def title_page(self):
+        volume = f'<p class="subtitle">{self.escape(self.volume_label)}</p>\n' if self.volume_label else ''
+        return (f'<div class="title-page">\n<h1>{self.escape(self.book_title)}</h1>\n'
+                f'<p class="subtitle">{self.escape(self.book_subtitle)}</p>\n{volume}'
+                f'<p class="meta">来源：{self.escape(self.author)} · {self.date}</p>\n</div>\n')
+
+    def colophon(self):
+        return f'<p class="colophon">本电子书内容来源于知乎专栏文章，仅供个人学习参考使用。生成日期：{self.date}</p>\n'
+
+    def iter_document(self):
+        yield (f'<!DOCTYPE html>\n<html lang="zh-CN">\n<head>\n<meta charset="utf-8" />\n'
+               f'<title>{self.escape(self.book_title)}</title>\n<style>{HTML_STYLE}</style>\n</head>\n<body>\n')
+        yield self.title_page()
+
+        articles = list(self.articles)
+        yield '<nav>\n<h2>目录</h2>\n<ol>\n'
+        for idx, article_data in enumerate(articles, 1):
+            yield f'<li><a href="#chapter-{idx}">{self.escape(article_data["data"]["title"])}</a></li>\n'
+        yield '</ol>\n</nav>\n'
+
+        for idx, article_data in enumerate(articles, 1):
+            yield '<section>\n'
+            yield from self.iter_chapter(article_data, idx)
+            yield '</section>\n'
+
+        yield self.colophon()
+        yield '</body>\n</html>\n'
+
+
+class EpubRenderer(HtmlRenderer):
+    """EPUB 3: one XHTML file per chapter plus the images the chapters use, zipped.
+
+    Images are read from the directory the .epub is written to, where the
+    image pipeline put them.
+    """
+
+    extension = '.epub'
+
+    def __init__(self, articles_data):
+        super().__init__(articles_data)
+        # Asset paths referenced by the rendered chapters
+        self.images = set()
+
+    def render_image(self, block):
+        if block.path:
+            self.images.add(asset_href(block.path))
+        return super().render_image(block)
+
+    def xhtml(self, title, body):
+        return (f'<?xml version="1.0" encoding="utf-8"?>\n<!DOCTYPE html>\n'
+                f'<html xmlns="http://www.w3.org/1999/xhtml" xmlns:epub="http://www.idpf.org/2007/ops" '
+                f'xml:lang="zh-CN" lang="zh-CN">\n<head>\n<meta charset="utf-8" />\n<title>{self.escape(title)}</title>\n'
+                f'<link rel="stylesheet" type="text/css" href="style.css" />\n</head>\n<body>\n{body}</body>\n</html>\n')
+
+    def iter_document(self):
+        # An EPUB is a package of files, not one stream
+        raise NotImplementedError("EpubRenderer writes a zip archive, use save()")
+
+    def save(self, output_path):
+        output_path = Path(output_path)
+        articles = list(self.articles)
+        identifier = uuid.uuid5(uuid.NAMESPACE_URL, '\n'.join(
+            [self.book_title, self.volume_label] + [article_data['source_file'] for article_data in articles]))
+        modified = datetime.now(timezone.utc).strftime('%Y-%m-%dT%H:%M:%SZ')
+
+        chapters = []
+        for idx, article_data in enumerate(articles, 1):
+            title = article_data['data']['title']
+            body = ''.join(self.iter_chapter(article_data, idx))
+            chapters.append((f"chapter-{idx:03d}.xhtml", title, self.xhtml(title, body)))
+        images = sorted(path for path in self.images if (output_path.parent / path).is_file())
+
+        manifest = [
+            '<item id="nav" href="nav.xhtml" media-type="application/xhtml+xml" properties="nav" />',
+            '<item id="css" href="style.css" media-type="text/css" />',
+            '<item id="title" href="title.xhtml" media-type="application/xhtml+xml" />',
+        ]
+        spine = ['<itemref idref="title" />', '<itemref idref="nav" />']
+        for idx, (name, _, _) in enumerate(chapters, 1):
+            manifest.append(f'<item id="c{idx}" href="{name}" media-type="application/xhtml+xml" />')
+            spine.append(f'<itemref idref="c{idx}" />')
+        for idx, path in enumerate(images, 1):
+            media_type = MEDIA_TYPES.get(Path(path).suffix, 'application/octet-stream')
+            manifest.append(f'<item id="img{idx}" href="{self.escape(path)}" media-type="{media_type}" />')
+
+        title = self.book_title + (f"（{self.volume_label}）" if self.volume_label else "")
+        opf = (f'<?xml version="1.0" encoding="utf-8"?>\n'
+               f'<package xmlns="http://www.idpf.org/2007/opf" version="3.0" unique-identifier="book-id" xml:lang="zh-CN">\n'
+               f'<metadata xmlns:dc="http://purl.org/dc/elements/1.1/">\n'
+               f'<dc:identifier id="book-id">urn:uuid:{identifier}</dc:identifier>\n'
+               f'<dc:title>{self.escape(title)}</dc:title>\n'
+               f'<dc:creator>{self.escape(self.author)}</dc:creator>\n'
+               f'<dc:language>zh-CN</dc:language>\n'
+               f'<meta property="dcterms:modified">{modified}</meta>\n'
+               f'</metadata>\n<manifest>\n' + '\n'.join(manifest) + '\n</manifest>\n'
+               f'<spine>\n' + '\n'.join(spine) + '\n</spine>\n</package>\n')
+        toc = ''.join(f'<li><a href="{name}">{self.escape(chapter_title)}</a></li>\n'
+                      for name, chapter_title, _ in chapters)
+        nav = self.xhtml("目录", f'<nav epub:type="toc" id="toc">\n<h2>目录</h2>\n<ol>\n{toc}</ol>\n</nav>\n')
+        container = ('<?xml version="1.0" encoding="utf-8"?>\n'
+                     '<container version="1.0" xmlns="urn:oasis:names:tc:opendocument:xmlns:container">\n'
+                     '<rootfiles>\n<rootfile full-path="OEBPS/content.opf" media-type="application/oebps-package+xml" />\n'
+                     '</rootfiles>\n</container>\n')
+
+        tmp_path = output_path.with_name(output_path.name + '.tmp')
+        with zipfile.ZipFile(tmp_path, 'w', zipfile.ZIP_DEFLATED) as book:
+            # The mimetype entry must come first and be stored uncompressed
+            book.writestr('mimetype', 'application/epub+zip', compress_type=zipfile.ZIP_STORED)
+            book.writestr('META-INF/container.xml', container)
+            book.writestr('OEBPS/content.opf', opf)
+            book.writestr('OEBPS/nav.xhtml', nav)
+            book.writestr('OEBPS/style.css', HTML_STYLE)
+            book.writestr('OEBPS/title.xhtml', self.xhtml(self.book_title, self.title_page() + self.colophon()))
+            for name, _, text in chapters:
+                book.writestr(f'OEBPS/{name}', text)
+            for path in images:
+                # Images are already compressed
+                book.write(output_path.parent / path, f'OEBPS/{path}', compress_type=zipfile.ZIP_STORED)
+        os.replace(tmp_path, output_path)
+        print(f"{type(self).__name__}: saved to {output_path} ({len(chapters)} chapters, {len(images)} images)")
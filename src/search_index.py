@@ -0,0 +1,357 @@
+"""Full-text search over the parsed articles.
+
+build_index() turns parsed articles (parse_directory output, or
+articles_data.json / .jsonl) into one index file; SearchIndex maps that
+file and answers queries without parsing any HTML or loading the index
+into Python objects.
+
+Text is tokenized into character bigrams for CJK runs (single characters
+for one-character runs) and lowercase words for Latin letters and digits.
+Each indexed unit is a content block. Postings are sorted block ids,
+gap-encoded as varints in one byte array. The term dictionary is a sorted
+UTF-8 blob with an offsets array, searched by binary search straight from
+the mapping. A query is tokenized the same way, its postings are
+intersected (rarest first), and candidates are checked against the stored
+block text, so bigrams that only co-occur do not produce false hits.
+
+File layout (all integers little-endian):
+
+    magic (8 bytes) | header length (uint32) | header JSON | padding to 4
+    | term offsets (uint32 * (terms + 1)) | posting offsets (uint32 * (terms + 1))
+    | block article ids | block numbers | block heading ids | block text offsets
+      (uint32 * blocks each, text offsets * (blocks + 1))
+    | term blob | posting blob | text blob
+
+The header holds article titles, source files, heading paths and the
+section offsets.
+
+    python src/search_index.py build                  # index output/articles_data.*
+    python src/search_index.py query 记忆管理 -n 5
+"""
+
+import argparse
+from array import array
+from bisect import bisect_left
+import json
+import mmap
+import os
+from pathlib import Path
+import re
+import sys
+import time
+
+from blocks import HeadingBlock, ImageBlock, ListBlock, blocks_from_dicts
+
+MAGIC = b'ZHIDX\x00\x01\x00'
+INDEX_FILENAME = "search_index.bin"
+# CJK runs (bigrams) and runs of Latin letters/digits (words)
+TOKEN_RE = re.compile(r'[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[a-z0-9]+')
+SNIPPET_CHARS = 40
+NO_HEADING = 0xFFFFFFFF
+
+
+def tokenize(text):
+    """Yield the index terms of a text: CJK character bigrams and lowercase words"""
+    for run in TOKEN_RE.findall(text.lower()):
+        if run[0] < '\u3400':
+            yield run
+        elif len(run) == 1:
+            yield run
+        else:
+            for i in range(len(run) - 1):
+                yield run[i:i + 2]
+
+
+def indexed_text(block):
+    """Searchable text of a block: list items joined, image captions, plain text otherwise"""
+    if isinstance(block, ListBlock):
+        return '\n'.join(block.items)
+    if isinstance(block, ImageBlock):
+        return block.caption
+    return block.text
+
+
+def encode_postings(block_ids, out):
+    """Append sorted block ids to a bytearray as varint-encoded gaps"""
+    previous = 0
+    for block_id in block_ids:
+        gap = block_id - previous
+        previous = block_id
+        while gap >= 0x80:
+            out.append((gap & 0x7F) | 0x80)
+            gap >>= 7
+        out.append(gap)
+
+
+def decode_postings(data):
+    """Decode a varint gap list back into block ids"""
+    ids = []
+    value = shift = previous = 0
+    for byte in data:
+        value |= (byte & 0x7F) << shift
+        if byte & 0x80:
+            shift += 7
+        else:
+            previous += value
+            ids.append(previous)
+            value = shift = 0
+    return ids
+
+
+def _uint32s(values):
+    data = array('I', values)
+    if sys.byteorder != 'little':
+        data.byteswap()
+    return data.tobytes()
+
+
+def build_index(articles, index_path):
+    """Index the blocks of the given articles into index_path; returns (blocks, terms)"""
+    postings = {}
+    block_articles = array('I')
+    block_numbers = array('I')
+    block_headings = array('I')
+    text_offsets = array('I', [0])
+    text_blob = bytearray()
+    heading_ids = {}
+    titles = []
+    source_files = []
+
+    for article_id, article_data in enumerate(articles):
+        article = article_data['data']
+        titles.append(article['title'])
+        source_files.append(article_data['source_file'])
+        # Heading path by level, e.g. ["第八章：记忆管理", "实际应用"]
+        path = []
+        for number, block in enumerate(blocks_from_dicts(article['content'])):
+            if isinstance(block, HeadingBlock):
+                path = path[:block.level - 1] + [block.text]
+            text = indexed_text(block)
+            block_id = len(block_articles)
+            heading = ' > '.join(path)
+            block_articles.append(article_id)
+            block_numbers.append(number)
+            block_headings.append(heading_ids.setdefault(heading, len(heading_ids)) if heading else NO_HEADING)
+            text_blob += text.encode('utf-8')
+            text_offsets.append(len(text_blob))
+            for term in set(tokenize(text)):
+                postings.setdefault(term, []).append(block_id)
+
+    terms = sorted(postings)
+    term_blob = bytearray()
+    term_offsets = array('I', [0])
+    posting_blob = bytearray()
+    posting_offsets = array('I', [0])
+    for term in terms:
+        term_blob += term.encode('utf-8')
+        term_offsets.append(len(term_blob))
+        encode_postings(postings[term], posting_blob)
+        posting_offsets.append(len(posting_blob))
+
+    blocks = len(block_articles)
+    sections = [
+        ('term_offsets', _uint32s(term_offsets)),
+        ('posting_offsets', _uint32s(posting_offsets)),
+        ('block_articles', _uint32s(block_articles)),
+        ('block_numbers', _uint32s(block_numbers)),
+        ('block_headings', _uint32s(block_headings)),
+        ('text_offsets', _uint32s(text_offsets)),
+        ('terms', bytes(term_blob)),
+        ('postings', bytes(posting_blob)),
+        ('texts', bytes(text_blob)),
+    ]
+    header = {
+        'terms': len(terms),
+        'blocks': blocks,
+        'titles': titles,
+        'source_files': source_files,
+        'headings': list(heading_ids),
+        'sections': {},
+    }
+    # Section offsets are relative to the end of the padded header
+    offset = 0
+    for name, data in sections:
+        header['sections'][name] = [offset, len(data)]
+        offset += len(data)
+    header_bytes = json.dumps(header, ensure_ascii=False).encode('utf-8')
+    header_bytes += b' ' * (-(len(MAGIC) + 4 + len(header_bytes)) % 4)
+
+    index_path = Path(index_path)
+    index_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = index_path.with_name(index_path.name + '.tmp')
+    with open(tmp_path, 'wb') as f:
+        f.write(MAGIC)
+        f.write(len(header_bytes).to_bytes(4, 'little'))
+        f.write(header_bytes)
+        for _, data in sections:
+            f.write(data)
+    os.replace(tmp_path, index_path)
+    return blocks, len(terms)
+
+
+class SearchIndex:
+    """A memory-mapped index written by build_index()"""
+
+    def __init__(self, index_path):
+        self._file = open(index_path, 'rb')
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            self.close()
+            raise ValueError(f"{index_path} is not a search index (rebuild it with 'search_index.py build')")
+        header_length = int.from_bytes(self._map[len(MAGIC):len(MAGIC) + 4], 'little')
+        start = len(MAGIC) + 4
+        header = json.loads(self._map[start:start + header_length])
+        self.term_count = header['terms']
+        self.block_count = header['blocks']
+        self.titles = header['titles']
+        self.source_files = header['source_files']
+        self.headings = header['headings']
+
+        base = start + header_length
+        view = memoryview(self._map)
+        self._views = [view]
+        sections = {}
+        for name, (offset, length) in header['sections'].items():
+            sections[name] = view[base + offset:base + offset + length]
+        for name in ('term_offsets', 'posting_offsets', 'block_articles', 'block_numbers',
+                     'block_headings', 'text_offsets'):
+            if sys.byteorder == 'little':
+                sections[name] = sections[name].cast('I')
+            else:
+                values = array('I', sections[name])
+                values.byteswap()
+                sections[name] = values
+            self._views.append(sections[name])
+        self._sections = sections
+
+    def close(self):
+        # Views into the mapping have to be released before it can be closed
+        for view in reversed(getattr(self, '_views', [])):
+            view.release()
+        self._views = []
+        self._sections = {}
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+        return False
+
+    def _term(self, i):
+        offsets = self._sections['term_offsets']
+        return bytes(self._sections['terms'][offsets[i]:offsets[i + 1]])
+
+    def postings(self, term):
+        """Return the sorted block ids containing a term (empty if unknown)"""
+        key = term.encode('utf-8')
+        # bisect over the mapped dictionary without materializing it
+        i = bisect_left(range(self.term_count), key, key=self._term)
+        if i == self.term_count or self._term(i) != key:
+            return []
+        offsets = self._sections['posting_offsets']
+        return decode_postings(self._sections['postings'][offsets[i]:offsets[i + 1]])
+
+    def block_text(self, block_id):
+        offsets = self._sections['text_offsets']
+        return bytes(self._sections['texts'][offsets[block_id]:offsets[block_id + 1]]).decode('utf-8')
+
+    def search(self, query, limit=20):
+        """Return up to `limit` blocks containing every word of the query, in book order.
+
+        Each hit is a dict with the block id, its position (chapter number,
+        article title, source file, block number), the heading path it sits
+        under, and a snippet around the first match.
+        """
+        words = query.lower().split()
+        terms = set()
+        for word in words:
+            terms.update(tokenize(word))
+        if not terms:
+            return []
+        lists = sorted((self.postings(term) for term in terms), key=len)
+        candidates = lists[0]
+        for other in lists[1:]:
+            if not candidates:
+                break
+            other = set(other)
+            candidates = [block_id for block_id in candidates if block_id in other]
+
+        hits = []
+        for block_id in candidates:
+            text = self.block_text(block_id)
+            lowered = text.lower()
+            if not all(word in lowered for word in words):
+                continue
+            hits.append(self._hit(block_id, text, lowered.find(words[0])))
+            if len(hits) >= limit:
+                break
+        return hits
+
+    def _hit(self, block_id, text, match):
+        article_id = self._sections['block_articles'][block_id]
+        heading_id = self._sections['block_headings'][block_id]
+        start = max(0, match - SNIPPET_CHARS)
+        snippet = text[start:match + SNIPPET_CHARS * 2].replace('\n', ' ')
+        return {
+            'block': block_id,
+            'chapter': article_id + 1,
+            'title': self.titles[article_id],
+            'source_file': self.source_files[article_id],
+            'block_number': self._sections['block_numbers'][block_id],
+            'heading': self.headings[heading_id] if heading_id != NO_HEADING else '',
+            'snippet': ('…' if start else '') + snippet + ('…' if match + SNIPPET_CHARS * 2 < len(text) else ''),
+        }
+
+
+def main():
+    base_dir = Path(__file__).parent.parent
+    output_dir = base_dir / "output"
+    arg_parser = argparse.ArgumentParser(description="Build or query the full-text index of the parsed articles")
+    arg_parser.add_argument('--index', default=str(output_dir / INDEX_FILENAME), help="index file path")
+    commands = arg_parser.add_subparsers(dest='command', required=True)
+    build = commands.add_parser('build', help="index articles_data.jsonl / articles_data.json")
+    build.add_argument('--input', help="parsed data file (default: the newer of output/articles_data.jsonl/.json)")
+    query = commands.add_parser('query', help="search the index")
+    query.add_argument('text', nargs='+', help="words to search for (all must match)")
+    query.add_argument('-n', '--limit', type=int, default=20, help="maximum number of hits (default: 20)")
+    args = arg_parser.parse_args()
+
+    if args.command == 'build':
+        # Imported here so queries do not pay for loading the generator
+        from generate_ebook import load_articles
+        data_path = Path(args.input) if args.input else None
+        if data_path is None:
+            candidates = [output_dir / name for name in ("articles_data.jsonl", "articles_data.json")]
+            candidates = [path for path in candidates if path.exists()]
+            if not candidates:
+                print("Error: articles_data.jsonl / articles_data.json not found.")
+                print("Please run 'python src/parse_local_html.py' first.")
+                return 1
+            data_path = max(candidates, key=lambda path: path.stat().st_mtime)
+        start = time.perf_counter()
+        blocks, terms = build_index(load_articles(data_path), args.index)
+        print(f"Indexed {blocks} blocks ({terms} terms) from {data_path} in {time.perf_counter() - start:.3f}s")
+        print(f"Index saved to {args.index} ({os.path.getsize(args.index)} bytes)")
+        return 0
+
+    if not os.path.exists(args.index):
+        print(f"Error: {args.index} not found. Run 'python src/search_index.py build' first.")
+        return 1
+    start = time.perf_counter()
+    with SearchIndex(args.index) as index:
+        hits = index.search(' '.join(args.text), args.limit)
+        elapsed = time.perf_counter() - start
+        for hit in hits:
+            location = f"第 {hit['chapter']} 章 · {hit['title']}"
+            if hit['heading']:
+                location += f" › {hit['heading']}"
+            print(f"[{hit['block']}] {location} (block {hit['block_number']})")
+            print(f"    {hit['snippet']}")
+    print(f"\n{len(hits)} hit(s) in {elapsed * 1000:.1f} ms")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
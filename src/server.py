@@ -0,0 +1,333 @@
+"""Local HTTP conversion service.
+
+Other tools POST a saved Zhihu page and get back its blocks or a
+rendered book, without paying interpreter start-up and imports for
+every page:
+
+    POST /parse      -> the article as JSON ({'title', 'content', 'related_links'})
+    POST /typst      -> a Typst book holding that one article
+    POST /markdown   -> the same as Markdown
+    POST /html       -> the same as a standalone HTML page
+    GET  /stats      -> request, cache and queue counters as JSON
+    GET  /health     -> {"status": "ok"}
+
+Parsing is CPU-bound, so requests are served by threads that hand the
+work to a process pool whose workers each keep a warm LocalHTMLParser.
+At most `queue` conversions may be in flight; beyond that the server
+answers 503 with Retry-After at once instead of letting requests pile
+up. Responses are cached in an LRU keyed by the endpoint and the SHA-256
+of the request body, so a page sent again is answered from memory, and
+identical requests arriving together share one conversion.
+
+    python src/server.py -j 4 --port 8765
+    curl --data-binary @page.html http://127.0.0.1:8765/typst
+
+benchmarks/load_test.py measures throughput and latency percentiles.
+"""
+
+import argparse
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import os
+import signal
+import sys
+import threading
+import time
+from urllib.parse import urlparse
+
+from blocks import to_json
+from formats import RENDERERS
+from parse_local_html import BACKENDS, LocalHTMLParser, sniff_encoding
+
+DEFAULT_PORT = 8765
+# Saved pages are a few MB at most; anything far larger is refused
+MAX_BODY_BYTES = 64 * 1024 * 1024
+# Endpoint -> output format ('json' is the parsed article itself)
+ENDPOINTS = {'/parse': 'json', '/typst': 'typst', '/markdown': 'markdown', '/html': 'html'}
+CONTENT_TYPES = {
+    'json': 'application/json; charset=utf-8',
+    'typst': 'text/plain; charset=utf-8',
+    'markdown': 'text/markdown; charset=utf-8',
+    'html': 'text/html; charset=utf-8',
+}
+
+# Each worker process builds one parser up front and keeps it, with its layout cache
+_worker_parser = None
+
+
+def init_worker(backend):
+    global _worker_parser
+    _worker_parser = LocalHTMLParser(backend)
+    # parse_article reports progress with print(); keep it out of the server's log
+    sys.stdout = open(os.devnull, 'w')
+
+
+def convert(data, output_format, source_name):
+    """Parse one page and render it in output_format; runs in a worker process.
+
+    Returns the response body, or None when the page has no article content.
+    """
+    encoding = sniff_encoding(data)
+    if encoding.startswith(('utf-16', 'utf-32')):
+        data = data.decode(encoding)
+    article = _worker_parser.parse_article(data, source_name, encoding)
+    if not article or not article['content']:
+        return None
+    if output_format == 'json':
+        return json.dumps(article, ensure_ascii=False, default=to_json).encode('utf-8')
+    renderer = RENDERERS[output_format]([{'source_file': source_name, 'data': article}])
+    return ''.join(renderer.iter_document()).encode('utf-8')
+
+
+class LRUCache:
+    """Thread-safe least-recently-used cache holding at most max_entries values"""
+
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            value = self.entries.get(key)
+            if value is not None:
+                self.entries.move_to_end(key)
+            return value
+
+    def put(self, key, value):
+        if self.max_entries <= 0:
+            return
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+
+class ConversionService:
+    """Process pool, admission control and response cache shared by all request threads"""
+
+    def __init__(self, workers=None, backend='auto', queue=None, cache_size=256, timeout=60):
+        self.workers = workers or os.cpu_count() or 1
+        # Enough in flight to keep every worker busy while the next requests are read
+        self.queue = queue or 4 * self.workers
+        self.timeout = timeout
+        self.executor = ProcessPoolExecutor(max_workers=self.workers, initializer=init_worker,
+                                            initargs=(backend,))
+        self.slots = threading.BoundedSemaphore(self.queue)
+        self.cache = LRUCache(cache_size)
+        self.lock = threading.Lock()
+        # cache key -> future of the conversion running for it, shared by identical concurrent requests
+        self.pending = {}
+        self.counters = {'requests': 0, 'cache_hits': 0, 'coalesced': 0, 'converted': 0, 'rejected': 0,
+                         'no_content': 0, 'errors': 0, 'timeouts': 0}
+        self.in_flight = 0
+        self.convert_seconds = 0.0
+
+    def warm_up(self):
+        """Start every worker process now rather than on the first requests"""
+        for future in [self.executor.submit(os.getpid) for _ in range(self.workers)]:
+            future.result()
+
+    def count(self, name):
+        with self.lock:
+            self.counters[name] += 1
+
+    def convert(self, data, output_format):
+        """Return (HTTP status, body, cache status) for one request"""
+        self.count('requests')
+        key = (output_format, hashlib.sha256(data).digest())
+        body = self.cache.get(key)
+        if body is not None:
+            self.count('cache_hits')
+            return 200, body, 'hit'
+        with self.lock:
+            future = self.pending.get(key)
+            owner = future is None
+            if owner:
+                # Backpressure: refuse at once instead of queueing without bound
+                if not self.slots.acquire(blocking=False):
+                    self.counters['rejected'] += 1
+                    return 503, b'{"error": "server busy, retry later"}', 'miss'
+                try:
+                    future = self.executor.submit(convert, data, output_format, "request")
+                except Exception as e:
+                    # BrokenProcessPool after a worker died, RuntimeError after shutdown
+                    self.slots.release()
+                    self.counters['errors'] += 1
+                    message = json.dumps({'error': f"{type(e).__name__}: {e}"}, ensure_ascii=False)
+                    return 500, message.encode('utf-8'), 'miss'
+                self.pending[key] = future
+                self.in_flight += 1
+            else:
+                self.counters['coalesced'] += 1
+        if owner:
+            # The slot is held until the worker is done, not until the client gives up,
+            # so conversions that outlive the timeout still count against the queue.
+            # Added outside self.lock: a future that is already done runs the callback at once
+            start = time.perf_counter()
+            future.add_done_callback(lambda future: self.finished(key, future, start))
+        try:
+            body = future.result(self.timeout)
+        except TimeoutError:
+            self.count('timeouts')
+            return 504, b'{"error": "conversion timed out"}', 'miss'
+        except Exception as e:
+            self.count('errors')
+            message = json.dumps({'error': f"{type(e).__name__}: {e}"}, ensure_ascii=False)
+            return 500, message.encode('utf-8'), 'miss'
+        if body is None:
+            self.count('no_content')
+            return 422, b'{"error": "no article content found"}', 'miss'
+        return 200, body, 'miss'
+
+    def finished(self, key, future, start):
+        """Done callback of a conversion: cache the result and free its queue slot"""
+        if not future.cancelled() and future.exception() is None and future.result() is not None:
+            # Cached before leaving pending, so no request in between converts the page again
+            self.cache.put(key, future.result())
+            self.count('converted')
+        with self.lock:
+            del self.pending[key]
+            self.in_flight -= 1
+            self.convert_seconds += time.perf_counter() - start
+        self.slots.release()
+
+    def stats(self):
+        with self.lock:
+            stats = dict(self.counters)
+            stats.update({
+                'in_flight': self.in_flight,
+                'queue': self.queue,
+                'workers': self.workers,
+                'cache_entries': len(self.cache.entries),
+                'mean_convert_ms': round(1000 * self.convert_seconds / stats['converted'], 2)
+                if stats['converted'] else None,
+            })
+        return stats
+
+    def shutdown(self):
+        self.executor.shutdown(cancel_futures=True)
+
+
+class ConversionHandler(BaseHTTPRequestHandler):
+    # Keep-alive, so clients can reuse one connection for many pages
+    protocol_version = 'HTTP/1.1'
+    server_version = 'ZhihuEbookConverter/1.0'
+
+    def do_GET(self):
+        path = urlparse(self.path).path
+        if path == '/stats':
+            self.respond(200, json.dumps(self.server.service.stats()).encode('utf-8'))
+        elif path == '/health':
+            self.respond(200, b'{"status": "ok"}')
+        else:
+            self.respond(404, b'{"error": "not found"}')
+
+    def do_POST(self):
+        output_format = ENDPOINTS.get(urlparse(self.path).path)
+        length = self.content_length()
+        if length is None:
+            return
+        if output_format is None:
+            self.discard_body(length)
+            self.respond(404, b'{"error": "unknown endpoint, use /parse, /typst, /markdown or /html"}')
+            return
+        if length > MAX_BODY_BYTES:
+            self.close_connection = True
+            self.respond(413, b'{"error": "request body too large"}')
+            return
+        if length == 0:
+            self.respond(400, b'{"error": "empty request body, send the saved HTML page"}')
+            return
+        data = self.rfile.read(length)
+        status, body, cache = self.server.service.convert(data, output_format)
+        headers = {'X-Cache': cache}
+        if status == 503:
+            headers['Retry-After'] = '1'
+        self.respond(status, body, CONTENT_TYPES[output_format] if status == 200 else None, headers)
+
+    def content_length(self):
+        """Return the request's Content-Length, or answer 411/400 and return None"""
+        value = self.headers.get('Content-Length')
+        # Without a usable length the body can't be skipped, so the connection is dropped
+        if value is None:
+            self.close_connection = True
+            self.respond(411, b'{"error": "Content-Length required"}')
+            return None
+        value = value.strip()
+        # Digits only: int() would also take "-1", "+5" or "1_0"
+        if not (value.isascii() and value.isdigit()):
+            self.close_connection = True
+            self.respond(400, b'{"error": "invalid Content-Length"}')
+            return None
+        return int(value)
+
+    def discard_body(self, length):
+        # The body has to be consumed to keep the connection usable
+        while length > 0:
+            chunk = self.rfile.read(min(length, 64 * 1024))
+            if not chunk:
+                break
+            length -= len(chunk)
+
+    def respond(self, status, body, content_type=None, headers=None):
+        self.send_response(status)
+        self.send_header('Content-Type', content_type or CONTENT_TYPES['json'])
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+class ConversionServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Connections waiting for a request thread; admission is limited by the service instead
+    request_queue_size = 128
+
+    def __init__(self, address, service, verbose=False):
+        super().__init__(address, ConversionHandler)
+        self.service = service
+        self.verbose = verbose
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description="Serve HTML -> blocks / Typst / Markdown / HTML conversion over HTTP")
+    arg_parser.add_argument('--host', default='127.0.0.1', help="address to bind (default: 127.0.0.1)")
+    arg_parser.add_argument('--port', type=int, default=DEFAULT_PORT, help=f"port (default: {DEFAULT_PORT})")
+    arg_parser.add_argument('-j', '--workers', type=int, default=0,
+                            help="parser processes (0 = one per CPU, default: 0)")
+    arg_parser.add_argument('--backend', default='auto', choices=('auto',) + BACKENDS,
+                            help="HTML parser backend (default: fastest installed)")
+    arg_parser.add_argument('--queue', type=int, default=0,
+                            help="conversions allowed in flight before answering 503 (default: 4 per worker)")
+    arg_parser.add_argument('--cache-size', type=int, default=256,
+                            help="responses kept in the LRU cache (0 = off, default: 256)")
+    arg_parser.add_argument('-v', '--verbose', action='store_true', help="log every request")
+    args = arg_parser.parse_args()
+
+    # Stop on SIGTERM the way Ctrl+C does, so the worker processes are shut down too
+    signal.signal(signal.SIGTERM, signal.default_int_handler)
+    service = ConversionService(args.workers or None, args.backend, args.queue or None, args.cache_size)
+    service.warm_up()
+    server = ConversionServer((args.host, args.port), service, args.verbose)
+    print(f"Serving on http://{args.host}:{server.server_port} "
+          f"({service.workers} worker(s), queue {service.queue}, cache {args.cache_size} entries)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        print(f"\nStopping: {json.dumps(service.stats())}")
+    finally:
+        server.server_close()
+        service.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,142 @@
+"""Multi-volume output for large collections.
+
+One .typ file per book stops scaling once hundreds of columns are fed in:
+Typst's compile time and memory grow faster than the document. The
+volume planner packs consecutive articles into volumes under a text-byte
+and/or block budget (an article is never split; one larger than the
+budget gets a volume of its own). Each volume is a complete book with
+its own title page, TOC and colophon, written by a pool of worker
+processes, and volumes.json next to them lists every volume with its
+articles.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import json
+import os
+from pathlib import Path
+import re
+import shutil
+
+from blocks import blocks_from_dicts
+from dedup import block_text
+from generate_ebook import EnhancedTypstEbookGenerator
+
+INDEX_FILENAME = "volumes.json"
+# Chapter folders of split volumes, see save_volumes
+CHAPTERS_DIR_RE = re.compile(r'chapters-\d{2,}')
+
+
+def article_size(article_data):
+    """Return (UTF-8 bytes of text, block count) for one article"""
+    size = blocks = 0
+    for block in article_data['data']['content']:
+        size += len(block_text(block).encode('utf-8'))
+        blocks += 1
+    return size, blocks
+
+
+def plan_volumes(articles, max_bytes=None, max_blocks=None):
+    """Group consecutive articles into volumes, each within both budgets where possible.
+
+    Returns a list of volumes, each a list of (article, bytes, blocks).
+    """
+    volumes = []
+    current = []
+    current_bytes = current_blocks = 0
+    for article_data in articles:
+        # Materialize streamed content: it is measured here and rendered later
+        article_data['data']['content'] = list(blocks_from_dicts(article_data['data']['content']))
+        size, blocks = article_size(article_data)
+        over = ((max_bytes and current_bytes + size > max_bytes)
+                or (max_blocks and current_blocks + blocks > max_blocks))
+        if current and over:
+            volumes.append(current)
+            current = []
+            current_bytes = current_blocks = 0
+        current.append((article_data, size, blocks))
+        current_bytes += size
+        current_blocks += blocks
+    if current:
+        volumes.append(current)
+    return volumes
+
+
+def volume_path(output_path, number):
+    """智能体设计模式.typ -> 智能体设计模式-第2卷.typ"""
+    output_path = Path(output_path)
+    return output_path.with_name(f"{output_path.stem}-第{number}卷{output_path.suffix}")
+
+
+def write_volume(articles, volume_label, output_path, split=False, chapters_dirname="chapters",
+                 cross_references=None):
+    """Generate one volume; runs in a worker process, so it only takes picklable arguments"""
+    generator = EnhancedTypstEbookGenerator(articles)
+    generator.volume_label = volume_label
+    if cross_references:
+        generator.set_cross_references(cross_references)
+    if split:
+        generator.save_typst_split(output_path, chapters_dirname)
+    else:
+        generator.save_typst(output_path)
+    return os.path.getsize(output_path)
+
+
+def save_volumes(articles, output_path, max_bytes=None, max_blocks=None, workers=1, split=False,
+                 cross_references=None):
+    """Plan volumes for the articles, write them (in parallel with workers > 1) and the index.
+
+    Volume files are named after output_path (see volume_path), and the
+    index is written as volumes.json in the same directory. Each volume
+    keeps the cross_references between its own sections. Returns the
+    index entries.
+    """
+    output_path = Path(output_path)
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    volumes = plan_volumes(articles, max_bytes, max_blocks)
+    total = len(volumes)
+    jobs = []
+    index = []
+    for number, volume in enumerate(volumes, 1):
+        path = volume_path(output_path, number)
+        label = f"第 {number} 卷（共 {total} 卷）"
+        # Split volumes each get their own chapter folder
+        chapters_dirname = f"chapters-{number:02d}"
+        jobs.append(([article_data for article_data, _, _ in volume], label, path, split, chapters_dirname,
+                     cross_references))
+        index.append({
+            'volume': number,
+            'file': path.name,
+            'chapters_dir': chapters_dirname if split else None,
+            'text_bytes': sum(size for _, size, _ in volume),
+            'blocks': sum(blocks for _, _, blocks in volume),
+            'articles': [
+                {'title': article_data['data']['title'], 'source_file': article_data['source_file']}
+                for article_data, _, _ in volume
+            ],
+        })
+
+    workers = max(1, min(workers or os.cpu_count() or 1, total))
+    if workers == 1:
+        sizes = [write_volume(*job) for job in jobs]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            sizes = list(executor.map(write_volume, *zip(*jobs)))
+    for entry, size in zip(index, sizes):
+        entry['output_bytes'] = size
+
+    # Volumes and chapter folders left over from a run that produced more of them
+    current = {entry['file'] for entry in index} | {entry['chapters_dir'] for entry in index}
+    for stale in output_path.parent.glob(f"{output_path.stem}-第*卷{output_path.suffix}"):
+        if stale.name not in current:
+            stale.unlink()
+    for stale in output_path.parent.glob("chapters-*"):
+        if stale.is_dir() and CHAPTERS_DIR_RE.fullmatch(stale.name) and stale.name not in current:
+            shutil.rmtree(stale)
+
+    index_path = output_path.with_name(INDEX_FILENAME)
+    tmp_path = index_path.with_name(index_path.name + '.tmp')
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({'book': output_path.name, 'volumes': index}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, index_path)
+    print(f"{total} volume(s) written, index saved to {index_path}")
+    return index
@@ -0,0 +1,179 @@
+"""Watch mode: rebuild the book whenever the saved HTML changes.
+
+A cold `python build.py` pays interpreter start-up, a parse of every page
+(or a cache load) and a full regeneration. BookWatcher stays resident
+instead: it keeps the parser, the generator and every parsed article in
+memory, polls the HTML directory's file list and mtimes, and when a burst
+of saves has settled for `debounce` seconds it
+
+- reparses only the files that were added or changed (and drops the
+  removed ones), updating the parse cache so the next cold build is warm;
+- resolves images for the reparsed articles only;
+- re-runs dedup over the whole corpus, reusing the block fingerprints
+  of the previous rebuild, so only edited blocks are hashed again;
+- regenerates the book (with split, only the changed chapter files are
+  rewritten).
+
+Each rebuild logs its own time and the latency from the newest save to
+the written .typ. Polling needs nothing outside the standard library and
+works on network drives and editors that save by renaming.
+"""
+
+import time
+from pathlib import Path
+
+from dedup import BlockDeduplicator
+from generate_ebook import EnhancedTypstEbookGenerator
+from images import ImagePipeline
+from metrics import metrics
+from parse_local_html import HTML_PATTERNS, LocalHTMLParser, ParseCache, find_html_files
+from search_index import INDEX_FILENAME, build_index
+
+
+class BookWatcher:
+    """Keep a parsed corpus in memory and rebuild the book when its HTML files change"""
+
+    def __init__(self, html_dir, output_dir, output_name, workers=1, backend='auto', use_cache=True, dedup=True,
+                 split=False, images=True, recursive=False, include=HTML_PATTERNS, exclude=(),
+                 search_index=False, interval=0.1, debounce=0.2):
+        self.html_dir = Path(html_dir)
+        self.output_dir = Path(output_dir)
+        self.output_path = self.output_dir / output_name
+        self.workers = workers
+        self.use_cache = use_cache
+        self.dedup = dedup
+        self.split = split
+        self.images = images
+        self.recursive = recursive
+        self.include = include
+        self.exclude = exclude
+        self.search_index = search_index
+        self.interval = interval
+        self.debounce = debounce
+        self.parser = LocalHTMLParser(backend)
+        self.generator = EnhancedTypstEbookGenerator([])
+        self.cache = None
+        # html file -> (mtime_ns, size) as of the last build
+        self.snapshot = {}
+        # html file -> parsed article data; files without content are absent
+        self.articles = {}
+        # Block fingerprints of the last dedup pass (see BlockDeduplicator)
+        self.dedup_keys = {}
+        self.rebuilds = 0
+
+    def scan(self):
+        """Return {html file: (mtime_ns, size)} for the files currently selected, in build order"""
+        snapshot = {}
+        for html_file in find_html_files(self.html_dir, self.recursive, self.include, self.exclude):
+            try:
+                stat = html_file.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[html_file] = (stat.st_mtime_ns, stat.st_size)
+        return snapshot
+
+    def build(self):
+        """Parse everything (through the parse cache) and write the book once"""
+        start = time.perf_counter()
+        self.snapshot = self.scan()
+        cache_path = self.output_dir / ".parse_cache" if self.use_cache else None
+        articles = self.parser.iter_directory(self.html_dir, workers=self.workers, cache_path=cache_path,
+                                              recursive=self.recursive, include=self.include, exclude=self.exclude)
+        for article_data in articles:
+            self.articles[self.html_dir / article_data['source_file']] = article_data
+        if cache_path:
+            self.cache = ParseCache(cache_path)
+        self._resolve_images(list(self.articles.values()))
+        self._write()
+        print(f"\nInitial build: {len(self.articles)} article(s) in {time.perf_counter() - start:.3f}s")
+
+    def rebuild(self, snapshot):
+        """Bring the book up to date with snapshot; return the rebuild time in seconds"""
+        start = time.perf_counter()
+        changed = [html_file for html_file, state in snapshot.items() if self.snapshot.get(html_file) != state]
+        removed = [html_file for html_file in self.snapshot if html_file not in snapshot]
+        self.snapshot = snapshot
+
+        for html_file in removed:
+            self.articles.pop(html_file, None)
+            print(f"Removed: {html_file.relative_to(self.html_dir).as_posix()}")
+        reparsed = []
+        for html_file in changed:
+            source_file = html_file.relative_to(self.html_dir).as_posix()
+            print(f"Changed: {source_file}")
+            article = self.parser.parse_article_from_file(html_file)
+            if self.cache and article is not None:
+                self.cache.put(html_file, article)
+            if article and article['content']:
+                self.articles[html_file] = {'source_file': source_file, 'data': article}
+                reparsed.append(self.articles[html_file])
+            else:
+                self.articles.pop(html_file, None)
+                print("  Skipped (no content found)")
+        if self.cache:
+            if removed:
+                self.cache.prune(list(snapshot))
+            self.cache.save()
+
+        self._resolve_images(reparsed)
+        self._write()
+        elapsed = time.perf_counter() - start
+        self.rebuilds += 1
+        metrics.add_time('watch.rebuild', elapsed)
+        return elapsed
+
+    def _resolve_images(self, articles):
+        # Unchanged articles keep the image paths resolved when they were parsed
+        if self.images and articles:
+            pipeline = ImagePipeline(self.output_dir / "images")
+            for _ in pipeline.process(articles, self.html_dir):
+                pass
+
+    def _write(self):
+        # Dict order follows the scan, so chapters keep the order of a cold build
+        articles = [self.articles[html_file] for html_file in self.snapshot if html_file in self.articles]
+        if self.dedup:
+            deduplicator = BlockDeduplicator(key_cache=self.dedup_keys)
+            articles = list(deduplicator.process(articles))
+            self.dedup_keys = deduplicator.keys
+        if not articles:
+            print("No articles to write")
+            return
+        self.generator.articles = articles
+        if self.split:
+            self.generator.save_typst_split(self.output_path)
+        else:
+            self.generator.save_typst(self.output_path)
+        if self.search_index:
+            build_index(articles, self.output_dir / INDEX_FILENAME)
+
+    def run(self):
+        """Build once, then poll for changes until interrupted"""
+        self.output_dir.mkdir(parents=True, exist_ok=True)
+        self.build()
+        print(f"\nWatching {self.html_dir} (Ctrl+C to stop)")
+        seen = self.snapshot
+        settled_at = None
+        try:
+            while True:
+                time.sleep(self.interval)
+                snapshot = self.scan()
+                now = time.perf_counter()
+                if snapshot != seen:
+                    # Still changing: wait until the burst has settled
+                    seen = snapshot
+                    settled_at = now + self.debounce
+                    continue
+                if settled_at is None or now < settled_at:
+                    continue
+                settled_at = None
+                if snapshot == self.snapshot:
+                    continue
+                saves = [state[0] for html_file, state in snapshot.items() if self.snapshot.get(html_file) != state]
+                newest_save = max(saves) / 1e9 if saves else None
+                print(f"\n[{time.strftime('%H:%M:%S')}] Rebuilding ...")
+                elapsed = self.rebuild(snapshot)
+                latency = f", {time.time() - newest_save:.3f}s after the last save" if newest_save else ""
+                print(f"Rebuild #{self.rebuilds} took {elapsed:.3f}s{latency}")
+        except KeyboardInterrupt:
+            print(f"\nStopped after {self.rebuilds} rebuild(s)")
@@ -0,0 +1,5 @@
+import sys
+from pathlib import Path
+
+# The scripts in src/ import each other by bare module name, as build.py arranges
+sys.path.insert(0, str(Path(__file__).parent.parent / "src"))
@@ -0,0 +1,53 @@
+"""Every HTML parser backend must turn the bundled pages into the same articles."""
+
+from pathlib import Path
+
+import pytest
+
+from parse_local_html import BACKENDS, LocalHTMLParser, backend_available
+
+HTML_DIR = Path(__file__).parent.parent / "html_sources"
+
+
+def parse_with(backend):
+    return LocalHTMLParser(backend).parse_directory(HTML_DIR)
+
+
+@pytest.fixture(scope="module")
+def reference_articles():
+    # html.parser ships with Python, so it is always there to compare against
+    articles = parse_with('html.parser')
+    assert articles, f"no articles parsed from {HTML_DIR}"
+    return articles
+
+
+@pytest.mark.parametrize("backend", [backend for backend in BACKENDS if backend != 'html.parser'])
+def test_backend_matches_html_parser(backend, reference_articles):
+    if not backend_available(backend):
+        pytest.skip(f"{backend} is not installed")
+    assert parse_with(backend) == reference_articles
+
+
+EDGE_CASES = {
+    'empty': '',
+    'whitespace': ' \n\t \n',
+    'comment_only': '<!-- saved from url=(0040)https://zhuanlan.zhihu.com/p/1 -->',
+    'fragment': '<h2>没有 body 的片段</h2><p>' + '这是一段足够长的正文内容。' * 5 + '</p>',
+    'empty_bytes': b'',
+    'fragment_bytes': '<p>只有一段文字的片段，没有 html 与 body 标签。</p>'.encode('utf-8'),
+}
+
+
+@pytest.mark.parametrize("name", EDGE_CASES)
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_edge_case_inputs(backend, name):
+    if not backend_available(backend):
+        pytest.skip(f"{backend} is not installed")
+    html_content = EDGE_CASES[name]
+    encoding = 'utf-8' if isinstance(html_content, bytes) else None
+    result = LocalHTMLParser(backend).parse_article(html_content, name, encoding)
+    assert result == LocalHTMLParser('html.parser').parse_article(html_content, name, encoding)
+    if name.startswith(('empty', 'whitespace', 'comment')):
+        assert result is None
+    else:
+        assert result['content']
@@ -0,0 +1,21 @@
+"""Language tags guess_language() gives to code blocks."""
+
+import pytest
+
+from code_language import guess_language, looks_like_json
+
+
+@pytest.mark.parametrize("code", ['', ' ', '\n\t \n'])
+def test_empty_code_is_not_json(code):
+    assert not looks_like_json(code)
+    assert guess_language(code) == ''
+
+
+@pytest.mark.parametrize("code, language", [
+    ('{}', 'json'),
+    ('{\n  "name": "agent",\n  "tools": ["search", "calculator"]\n}', 'json'),
+    ('import os\n\ndef main():\n    return os.getcwd()\n', 'python'),
+    ('[x for x in range(3)]', ''),
+])
+def test_guess_language(code, language):
+    assert guess_language(code) == language
@@ -0,0 +1,62 @@
+"""What BlockDeduplicator removes, on the bundled pages and on a constructed overlap."""
+
+from pathlib import Path
+
+from blocks import HeadingBlock, ParagraphBlock
+from dedup import BlockDeduplicator
+from parse_local_html import LocalHTMLParser
+
+HTML_DIR = Path(__file__).parent.parent / "html_sources"
+
+
+def article(source_file, blocks):
+    return {'source_file': source_file, 'data': {'title': source_file, 'content': blocks, 'related_links': []}}
+
+
+def paragraph(n):
+    """A distinct ~900-byte paragraph: CJK characters picked by a simple per-n sequence"""
+    return ParagraphBlock(''.join(chr(0x4e00 + (n * 7919 + i * 104729) % 20000) for i in range(300)))
+
+
+def removed_blocks(articles):
+    """Run dedup and return [(source_file, index, block type)] of every block it removed"""
+    deduplicator = BlockDeduplicator()
+    kept = {article_data['source_file']: article_data['data']['content']
+            for article_data in deduplicator.process(articles)}
+    removed = []
+    for article_data in articles:
+        remaining = kept.get(article_data['source_file'], [])
+        for index, block in enumerate(article_data['data']['content']):
+            if not any(block is other for other in remaining):
+                removed.append((article_data['source_file'], index, block.type))
+    return removed
+
+
+def test_corpus_keeps_every_block():
+    # The full text and the parts share their introductions and chapter-list
+    # pictures, which are too short to count as duplicated material
+    articles = LocalHTMLParser().parse_directory(HTML_DIR)
+    for article_data in articles:
+        article_data['data']['content'] = list(article_data['data']['content'])
+    assert len(articles) == 4
+    assert removed_blocks(articles) == []
+
+
+def test_long_repeated_span_is_dropped():
+    shared = [paragraph(n) for n in range(4)]
+    first = article('a.html', [HeadingBlock(1, "第一章")] + shared)
+    second = article('b.html', [paragraph(10), HeadingBlock(1, "第一章")] + shared + [paragraph(11)])
+    assert removed_blocks([first, second]) == [('b.html', index, 'paragraph') for index in range(2, 6)]
+
+
+def test_headings_first_block_and_short_spans_are_kept():
+    intro = [paragraph(0), ParagraphBlock("简短的重复说明"), ParagraphBlock("另一段简短说明")]
+    first = article('a.html', intro + [HeadingBlock(1, "母贴地址"), paragraph(1)])
+    second = article('b.html', intro + [HeadingBlock(1, "母贴地址"), paragraph(2), paragraph(3)])
+    assert removed_blocks([first, second]) == []
+
+
+def test_contained_article_is_dropped():
+    blocks = [paragraph(n) for n in range(5)]
+    removed = removed_blocks([article('a.html', blocks), article('b.html', list(blocks))])
+    assert removed == [('b.html', index, 'paragraph') for index in range(5)]
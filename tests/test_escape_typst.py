@@ -0,0 +1,75 @@
+"""escape_typst must give exactly what the original chain of str.replace calls gave."""
+
+from pathlib import Path
+import random
+
+import pytest
+
+from blocks import ImageBlock, ListBlock
+from generate_ebook import EnhancedTypstEbookGenerator
+from parse_local_html import LocalHTMLParser
+
+HTML_DIR = Path(__file__).parent.parent / "html_sources"
+SPECIAL = '\\#$_*[]<>@'
+ALPHABET = SPECIAL + 'abcXYZ019 .,-()\n\t' + '智能体设计模式，。：“”'
+
+
+def escape_with_replace(text):
+    """The implementation escape_typst replaced, kept as the reference"""
+    if not text:
+        return ""
+    text = text.replace('\\', '\\\\')
+    replacements = {
+        '#': '\\#',
+        '$': '\\$',
+        '_': '\\_',
+        '*': '\\*',
+        '[': '\\[',
+        ']': '\\]',
+        '<': '\\<',
+        '>': '\\>',
+        '@': '\\@',
+    }
+    for old, new in replacements.items():
+        text = text.replace(old, new)
+    return text
+
+
+def corpus_strings():
+    """Every title, heading, paragraph, quote, list item and caption in html_sources/"""
+    strings = []
+    for article_data in LocalHTMLParser().parse_directory(HTML_DIR):
+        article = article_data['data']
+        strings.append(article['title'])
+        for block in article['content']:
+            if isinstance(block, ListBlock):
+                strings.extend(block.items)
+            elif isinstance(block, ImageBlock):
+                strings.append(block.caption)
+            else:
+                strings.append(block.text)
+    return strings
+
+
+@pytest.fixture(scope="module")
+def generator():
+    return EnhancedTypstEbookGenerator([])
+
+
+def test_corpus_strings(generator):
+    strings = corpus_strings()
+    assert strings
+    for text in strings:
+        assert generator.escape_typst(text) == escape_with_replace(text)
+
+
+def test_random_strings(generator):
+    rng = random.Random(20240509)
+    for _ in range(20000):
+        text = ''.join(rng.choices(ALPHABET, k=rng.randint(0, 40)))
+        assert generator.escape_typst(text) == escape_with_replace(text)
+
+
+@pytest.mark.parametrize("text", ['', '\\', '\\#', '#\\', '\\\\@', '<<>>', '智能体_设计*模式'])
+def test_edge_cases(generator, text):
+    assert generator.escape_typst(text) == escape_with_replace(text)
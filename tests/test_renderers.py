@@ -0,0 +1,32 @@
+"""Markdown escaping: text must never turn into list, quote or heading syntax."""
+
+import pytest
+
+from blocks import ParagraphBlock
+from renderers import MarkdownRenderer
+
+
+@pytest.fixture(scope="module")
+def renderer():
+    return MarkdownRenderer([])
+
+
+@pytest.mark.parametrize("text, escaped", [
+    ("1. 第一步", "1\\. 第一步"),
+    ("  12) 编号", "  12\\) 编号"),
+    ("- 不是列表", "\\- 不是列表"),
+    ("+ 也不是", "\\+ 也不是"),
+    ("> 不是引用", "\\> 不是引用"),
+    ("# 不是标题", "\\# 不是标题"),
+    ("===", "\\==="),
+    ("~~~", "\\~~~"),
+    ("第一行\n- 第二行\n3. 第三行", "第一行\n\\- 第二行\n3\\. 第三行"),
+    ("版本 2.0 - 发布于 2025", "版本 2.0 - 发布于 2025"),
+    ("a_b *c*", "a\\_b \\*c\\*"),
+])
+def test_escape(renderer, text, escaped):
+    assert renderer.escape(text) == escaped
+
+
+def test_paragraph_starting_with_list_marker(renderer):
+    assert renderer.render_paragraph(ParagraphBlock("1. 提示链")) == "1\\. 提示链\n\n"